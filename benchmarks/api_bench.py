@@ -0,0 +1,228 @@
+"""Endpoint latency on a synthetic dataset, reported as JSON.
+
+    $ python -m benchmarks.api_bench --actors 100000 --movies 20000
+    $ python -m benchmarks.api_bench --url postgresql://localhost/bench \\
+          --output results.json
+
+Seeds a scratch database (a temporary SQLite file unless --url is given;
+tables are dropped and recreated, never point it at real data) with N
+actors, M movies and --links-per-movie cast members per movie, all drawn
+from --seed so runs are comparable across commits. Each scenario runs
+through the Flask test client with token verification patched out like
+the test suite's auth fixture, except auth_rs256 which verifies real
+RS256 tokens signed with the test keys.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from jose import jwt
+
+from src.app import create_app
+from src.auth import Auth
+from src.jwks import jwks_store
+from src.token_cache import token_cache
+from src.models import (
+    db, Actor, Movie, Gender, StatCounter, count_stats, movie_actors_table)
+from benchmarks.bench_serving import percentile, make_token, server_env
+
+
+PERMISSIONS = ['get:actor', 'get:actors', 'get:movie', 'get:movies',
+               'patch:actor', 'patch:movie']
+CHUNK = 10000
+# Random actor pairs are not always connected.
+OK_STATUSES = {'actor_path': (200, 404)}
+NAMES = ['Smith', 'Garcia', 'Nguyen', 'Okafor', 'Rossi', 'Kowalski',
+         'Tanaka', 'Silva', 'Novak', 'Haddad']
+
+
+def seed(rng, args):
+    db.drop_all()
+    db.create_all()
+    for start in range(1, args.actors + 1, CHUNK):
+        db.session.execute(Actor.__table__.insert(), [
+            {'name': f'Actor {i} {rng.choice(NAMES)}',
+             'age': rng.randint(18, 80),
+             'gender': rng.choice(list(Gender))}
+            for i in range(start, min(start + CHUNK, args.actors + 1))])
+    for start in range(1, args.movies + 1, CHUNK):
+        db.session.execute(Movie.__table__.insert(), [
+            {'title': f'Movie {i} {rng.choice(NAMES)}',
+             'release_date': datetime(1980, 1, 1) + timedelta(
+                 days=rng.randint(0, 15000))}
+            for i in range(start, min(start + CHUNK, args.movies + 1))])
+    links = [{'movie_id': movie_id, 'actor_id': actor_id}
+             for movie_id in range(1, args.movies + 1)
+             for actor_id in rng.sample(range(1, args.actors + 1), min(
+                 args.links_per_movie, args.actors))]
+    for start in range(0, len(links), CHUNK):
+        db.session.execute(movie_actors_table.insert(),
+                           links[start:start + CHUNK])
+    db.session.execute(StatCounter.__table__.insert(), [
+        {'name': name, 'key': key, 'count': count} for (name, key), count
+        in count_stats(db.session.connection(), (Actor, Movie)).items()])
+    db.session.commit()
+    return len(links)
+
+
+def scenarios(rng, args):
+    def random_actor():
+        return rng.randint(1, args.actors)
+
+    def random_movie():
+        return rng.randint(1, args.movies)
+
+    return {
+        'get_actors': lambda: ('GET', '/api/actors?' + urlencode(
+            {'limit': 50}), None),
+        'get_actors_filtered': lambda: ('GET', '/api/actors?' + urlencode({
+            'gender': 'female', 'age_min': 30, 'age_max': 40,
+            'sort': '-age', 'limit': 50}), None),
+        'get_actor': lambda: ('GET', f'/api/actors/{random_actor()}', None),
+        'get_costars': lambda: (
+            'GET', f'/api/actors/{random_actor()}/costars', None),
+        'actor_path': lambda: (
+            'GET', f'/api/actors/{random_actor()}/path/{random_actor()}',
+            None),
+        'get_movies': lambda: ('GET', '/api/movies?' + urlencode(
+            {'limit': 50}), None),
+        'get_movie': lambda: ('GET', f'/api/movies/{random_movie()}', None),
+        'stats_genders': lambda: ('GET', '/api/stats/genders', None),
+        'stats_release_years': lambda: (
+            'GET', '/api/stats/release-years', None),
+        'stats_cast_sizes': lambda: (
+            'GET', '/api/stats/cast-sizes?' + urlencode({'limit': 50}),
+            None),
+        'search': lambda: ('GET', '/api/search?' + urlencode(
+            {'q': rng.choice(NAMES), 'limit': 20}), None),
+        'patch_actor': lambda: ('PATCH', f'/api/actors/{random_actor()}', {
+            'age': rng.randint(18, 80),
+            'add_movies': [random_movie()]}),
+        'patch_movie': lambda: ('PATCH', f'/api/movies/{random_movie()}', {
+            'actors': rng.sample(range(1, args.actors + 1), min(
+                args.links_per_movie, args.actors))}),
+    }
+
+
+def fake_token():
+    return 'Bearer ' + jwt.encode({'permissions': PERMISSIONS}, 'key')
+
+
+def run(client, make_request, count, token, ok_statuses=(200,)):
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(count):
+        method, path, body = make_request()
+        request_started = time.perf_counter()
+        res = client.open(path, method=method, json=body,
+                          headers={'Authorization': token()})
+        latencies.append((time.perf_counter() - request_started) * 1000)
+        if res.status_code not in ok_statuses:
+            errors += 1
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': count,
+        'errors': errors,
+        'throughput_rps': round(count / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3)
+    }
+
+
+def rs256_token():
+    # A new token per request so the verified token cache never hits.
+    token_cache.clear()
+    return 'Bearer ' + make_token()
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='database url, defaults to a '
+                                      'temporary SQLite file')
+    parser.add_argument('--actors', type=int, default=10000)
+    parser.add_argument('--movies', type=int, default=2000)
+    parser.add_argument('--links-per-movie', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200,
+                        help='requests per scenario')
+    parser.add_argument('--scenarios', nargs='+',
+                        help='scenarios to run, defaults to all')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report to a file '
+                                         'instead of stdout')
+    args = parser.parse_args()
+    path = None
+    if not args.url:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        args.url = f'sqlite:///{path}'
+    os.environ.update(server_env(args.url))
+    try:
+        app = create_app()
+        with app.app_context():
+            rng = random.Random(args.seed)
+            started = time.perf_counter()
+            links = seed(rng, args)
+            seed_seconds = time.perf_counter() - started
+            results = {}
+            verify = Auth.verify_decode_jwt
+            Auth.verify_decode_jwt = staticmethod(
+                lambda token: jwt.get_unverified_claims(token))
+            with app.test_client() as client:
+                for name, make_request in scenarios(rng, args).items():
+                    if args.scenarios and name not in args.scenarios:
+                        continue
+                    results[name] = run(
+                        client, make_request, args.requests, fake_token,
+                        OK_STATUSES.get(name, (200,)))
+                Auth.verify_decode_jwt = verify
+                if not args.scenarios or 'auth_rs256' in args.scenarios:
+                    jwks_store.clear()
+                    results['auth_rs256'] = run(
+                        client, lambda: ('GET', '/api/actors/1', None),
+                        args.requests, rs256_token)
+            report = {
+                'commit': git_commit(),
+                'database': db.engine.dialect.name,
+                'python': platform.python_version(),
+                'dataset': {
+                    'actors': args.actors,
+                    'movies': args.movies,
+                    'links': links,
+                    'seed': args.seed,
+                    'seed_seconds': round(seed_seconds, 1)
+                },
+                'results': results
+            }
+    finally:
+        if path:
+            os.remove(path)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        sys.stdout.write(output + '\n')
+
+
+if __name__ == '__main__':
+    main()
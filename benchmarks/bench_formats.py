@@ -0,0 +1,58 @@
+"""Payload size and encode/decode time of JSON and MessagePack responses.
+
+    $ python -m benchmarks.bench_formats --rows 20000
+
+Uses the same actor and movie list payloads as bench_json, encoded the
+way the API renders them for each Accept type.
+"""
+import json
+import time
+import argparse
+import statistics
+
+import msgpack
+
+from src import serialization
+from benchmarks.bench_json import make_rows
+
+
+def timed(function, value, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(value)
+        timings.append(time.perf_counter() - started)
+    return result, statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    encoders = [(f'json ({name})', name) for name in
+                serialization.available_json_backends()]
+    print(f"{'payload':<10}{'format':<18}{'KiB':>10}{'encode ms':>12}"
+          f"{'decode ms':>12}")
+    for label, payload in zip(('actors', 'movies'), make_rows(args.rows)):
+        results = []
+        for name, backend in encoders:
+            serialization.select_json_backend(backend)
+            data, encode = timed(serialization.dumps, payload, args.repeat)
+            loads = (serialization.orjson.loads if backend == 'orjson'
+                     else json.loads)
+            _, decode = timed(loads, data, args.repeat)
+            results.append((name, len(data), encode, decode))
+        data, encode = timed(lambda value: msgpack.packb(
+            value, default=serialization.default, use_bin_type=True),
+            payload, args.repeat)
+        _, decode = timed(lambda value: msgpack.unpackb(value, raw=False),
+                          data, args.repeat)
+        results.append(('msgpack', len(data), encode, decode))
+        for name, size, encode, decode in results:
+            print(f'{label:<10}{name:<18}{size / 1024:>10.0f}'
+                  f'{encode:>12.1f}{decode:>12.1f}')
+
+
+if __name__ == '__main__':
+    main()
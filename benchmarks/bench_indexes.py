@@ -0,0 +1,180 @@
+"""Query plans and latency before and after the association/filter indexes.
+
+    $ python -m benchmarks.bench_indexes --links 1000000
+    $ python -m benchmarks.bench_indexes --url postgresql://localhost/bench
+
+Seeds a scratch database (a temporary SQLite file unless --url is given;
+the tables are dropped and recreated, never point it at real data) with
+the schema the migrations create minus the indexes added by revisions
+9c41d2e7a8f0 and d2a6c8f1e3b9, runs each query, creates the indexes and
+runs them again. The title prefix query is the one the API runs: GLOB on
+SQLite, LIKE (served by the text_pattern_ops index) on Postgres.
+"""
+import os
+import time
+import random
+import argparse
+import tempfile
+import statistics
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, text
+
+from src.models import (
+    db, Actor, Movie, Gender, TITLE_PATTERN_DDL, TITLE_PATTERN_INDEX,
+    movie_actors_table, title_prefix_pattern)
+
+
+INDEXES = [
+    index for table in (movie_actors_table, Actor.__table__, Movie.__table__)
+    for index in table.indexes
+]
+
+# name -> (SQL, or SQL by dialect, params for (args, dialect))
+QUERIES = {
+    'movies for actor': (
+        'SELECT movie_id FROM movie_actors WHERE actor_id = :actor_id',
+        lambda args, dialect: {'actor_id': random.randint(1, args.actors)}),
+    'actors by name': (
+        'SELECT id FROM actors WHERE name = :name',
+        lambda args, dialect: {
+            'name': f'Actor {random.randint(1, args.actors)}'}),
+    'actors by age range': (
+        'SELECT id FROM actors WHERE age BETWEEN :low AND :low + 1',
+        lambda args, dialect: {'low': random.randint(18, 80)}),
+    'movies by title prefix': (
+        {'sqlite': 'SELECT id FROM movies WHERE title GLOB :pattern',
+         None: "SELECT id FROM movies WHERE title LIKE :pattern "
+               "ESCAPE '\\'"},
+        lambda args, dialect: {'pattern': title_prefix_pattern(
+            f'Movie {random.randint(1, args.movies)}', dialect)}),
+    'movies by release window': (
+        'SELECT id FROM movies WHERE release_date >= :start '
+        'AND release_date < :end',
+        lambda args, dialect: release_window()),
+}
+
+
+def dialect_sql(sql, dialect):
+    if isinstance(sql, dict):
+        return sql.get(dialect, sql[None])
+    return sql
+
+
+def release_window():
+    start = datetime(2000, 1, 1) + timedelta(days=random.randint(0, 8000))
+    return {'start': start, 'end': start + timedelta(days=7)}
+
+
+def seed(engine, args):
+    tables = [Actor.__table__, Movie.__table__, movie_actors_table]
+    db.metadata.drop_all(engine, tables=tables)
+    db.metadata.create_all(engine, tables=tables)
+    drop_indexes(engine)
+    chunk = 10000
+    with engine.begin() as conn:
+        for start in range(1, args.actors + 1, chunk):
+            conn.execute(Actor.__table__.insert(), [
+                {'id': i, 'name': f'Actor {i}', 'age': random.randint(18, 80),
+                 'gender': random.choice(list(Gender))}
+                for i in range(start, min(start + chunk, args.actors + 1))])
+        for start in range(1, args.movies + 1, chunk):
+            conn.execute(Movie.__table__.insert(), [
+                {'id': i, 'title': f'Movie {i}',
+                 'release_date': datetime(2000, 1, 1) + timedelta(
+                     days=random.randint(0, 8000))}
+                for i in range(start, min(start + chunk, args.movies + 1))])
+        links = set()
+        while len(links) < args.links:
+            links.add((random.randint(1, args.movies),
+                       random.randint(1, args.actors)))
+        links = sorted(links)
+        for start in range(0, len(links), chunk):
+            conn.execute(movie_actors_table.insert(), [
+                {'movie_id': movie_id, 'actor_id': actor_id}
+                for movie_id, actor_id in links[start:start + chunk]])
+    analyze(engine)
+
+
+def drop_indexes(engine):
+    with engine.begin() as conn:
+        for index in INDEXES:
+            index.drop(conn)
+        if conn.dialect.name == 'postgresql':
+            conn.execute(text(f'DROP INDEX IF EXISTS {TITLE_PATTERN_INDEX}'))
+
+
+def create_indexes(engine):
+    with engine.begin() as conn:
+        for index in INDEXES:
+            index.create(conn)
+        if conn.dialect.name == 'postgresql':
+            conn.execute(TITLE_PATTERN_DDL)
+
+
+def analyze(engine):
+    with engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+
+
+def explain(conn, sql, params):
+    if conn.dialect.name == 'sqlite':
+        rows = conn.execute(text(f'EXPLAIN QUERY PLAN {sql}'), params)
+        return [row[-1] for row in rows]
+    return [row[0] for row in conn.execute(text(f'EXPLAIN {sql}'), params)]
+
+
+def measure(engine, args):
+    results = {}
+    with engine.connect() as conn:
+        dialect = conn.dialect.name
+        for name, (sql, make_params) in QUERIES.items():
+            sql = dialect_sql(sql, dialect)
+            plan = explain(conn, sql, make_params(args, dialect))
+            timings = []
+            for _ in range(args.repeat):
+                params = make_params(args, dialect)
+                started = time.perf_counter()
+                conn.execute(text(sql), params).fetchall()
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = (plan, statistics.median(timings))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='database url, defaults to a '
+                                      'temporary SQLite file')
+    parser.add_argument('--actors', type=int, default=100000)
+    parser.add_argument('--movies', type=int, default=20000)
+    parser.add_argument('--links', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    path = None
+    if not args.url:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        args.url = f'sqlite:///{path}'
+    engine = create_engine(args.url)
+    try:
+        started = time.perf_counter()
+        seed(engine, args)
+        print(f'seeded {args.actors} actors, {args.movies} movies and '
+              f'{args.links} links in {time.perf_counter() - started:.1f}s')
+        before = measure(engine, args)
+        create_indexes(engine)
+        analyze(engine)
+        after = measure(engine, args)
+        for name in QUERIES:
+            print(f'\n{name}: {before[name][1]:.3f}ms -> '
+                  f'{after[name][1]:.3f}ms (median)')
+            print('  before: ' + ' | '.join(before[name][0]))
+            print('  after:  ' + ' | '.join(after[name][0]))
+    finally:
+        engine.dispose()
+        if path:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
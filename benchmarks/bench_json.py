@@ -0,0 +1,69 @@
+"""Response serialization time for large actor and movie lists.
+
+    $ python -m benchmarks.bench_json --rows 100000
+
+Compares Flask's own encoder (what jsonify used before, dates rendered as
+RFC 822 strings) with src.serialization.dumps on each available backend.
+"""
+import time
+import random
+import argparse
+import statistics
+from datetime import datetime, timedelta
+
+from flask import Flask, json
+
+from src import serialization
+
+
+def make_rows(count):
+    actors = [{
+        'id': i,
+        'name': f'Actor {i}',
+        'age': random.randint(18, 80),
+        'gender': random.choice(['male', 'female']),
+        'movies': random.sample(range(1, count + 1), 5)
+    } for i in range(1, count + 1)]
+    movies = [{
+        'id': i,
+        'title': f'Movie {i}',
+        'release_date': datetime(2000, 1, 1) + timedelta(
+            days=random.randint(0, 8000)),
+        'actors': random.sample(range(1, count + 1), 5)
+    } for i in range(1, count + 1)]
+    return {'actors': actors}, {'movies': movies}
+
+
+def measure(dumps, payload, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        size = len(dumps(payload))
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    app = Flask(__name__)
+    print(f"{'payload':<10}{'encoder':<12}{'median ms':>12}{'MB/s':>10}")
+    with app.app_context():
+        for label, payload in zip(('actors', 'movies'),
+                                  make_rows(args.rows)):
+            results = [('flask.json', measure(lambda payload: json.dumps(
+                payload, sort_keys=True).encode(), payload, args.repeat))]
+            for name in serialization.available_json_backends():
+                serialization.select_json_backend(name)
+                results.append((name, measure(lambda payload: (
+                    serialization.dumps(payload, sort_keys=True)),
+                    payload, args.repeat)))
+            for name, (elapsed, size) in results:
+                print(f'{label:<10}{name:<12}{elapsed:>12.1f}'
+                      f'{size / elapsed / 1000:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""RS256 verification throughput for each available crypto backend.
+
+    $ python -m benchmarks.bench_jwt_verify --seconds 2
+
+Reports verifications per second when the public key is rebuilt from the
+JWK n/e members on every call (what the API used to do) and when it is
+prepared once per JWKS key.
+"""
+import os
+import json
+import time
+import argparse
+
+from jose import jwt
+
+from src import jwt_backend
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), '..', 'test',
+                            'fixtures')
+AUDIENCE = 'https://bench/api'
+ISSUER = 'https://bench/'
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES_DIR, 'jwks.json')) as f:
+        jwk = json.load(f)['keys'][0]
+    with open(os.path.join(FIXTURES_DIR, 'jwks_private_key.pem')) as f:
+        private_key = f.read()
+    token = jwt.encode({
+        'iss': ISSUER,
+        'aud': AUDIENCE,
+        'exp': int(time.time()) + 3600,
+        'permissions': ['get:actors']
+    }, private_key, algorithm='RS256', headers={'kid': jwk['kid']})
+    return jwk, token
+
+
+def measure(token, key, seconds):
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        jwt.decode(token, key, algorithms='RS256', audience=AUDIENCE,
+                   issuer=ISSUER)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=2.0,
+                        help='time spent measuring each case')
+    args = parser.parse_args()
+    jwk, token = load_fixtures()
+    results = []
+    for name in jwt_backend.available_backends():
+        jwt_backend.select_backend(name)
+        results.append({
+            'backend': name,
+            'per_call_key': measure(token, jwk, args.seconds),
+            'prepared_key': measure(
+                token, [jwt_backend.prepare_key(jwk)], args.seconds)
+        })
+    print(f"{'backend':<14}{'per-call key/s':>16}{'prepared key/s':>16}")
+    for result in results:
+        print(f"{result['backend']:<14}{result['per_call_key']:>16.0f}"
+              f"{result['prepared_key']:>16.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+"""Load test comparing gunicorn sync workers with the ASGI entry point.
+
+    $ python -m benchmarks.bench_serving --concurrency 8 64 --seconds 10
+    $ python -m benchmarks.bench_serving --modes asgi --workers 1
+
+Seeds a scratch database (a temporary SQLite file unless --url is given;
+tables are dropped and recreated, never point it at real data), starts
+each server mode on a local port with the test signing keys and sends
+authorized GET requests from the given number of keep-alive clients.
+Needs gunicorn and uvicorn installed.
+"""
+import os
+import sys
+import time
+import json
+import signal
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+from datetime import datetime
+from http.client import HTTPConnection
+from urllib.parse import urlencode
+
+from jose import jwt
+
+from src.app import create_app
+from src.models import db, Actor, Movie, Gender, movie_actors_table
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), '..', 'test',
+                            'fixtures')
+DOMAIN = 'bench.local'
+AUDIENCE = 'https://bench/api'
+PATHS = [
+    '/api/actors?' + urlencode({'limit': 50}),
+    '/api/movies?' + urlencode({'limit': 50}),
+    '/api/actors/1',
+    '/api/search?' + urlencode({'q': 'actor 1'}),
+]
+
+
+def server_env(url):
+    return dict(
+        os.environ,
+        AUTH0_DOMAIN=DOMAIN,
+        API_AUDIENCE=AUDIENCE,
+        ALGORITHMS='RS256',
+        AUTH0_JWKS_URL=os.path.join(FIXTURES_DIR, 'jwks.json'),
+        DATABASE_URL=url)
+
+
+def make_token():
+    with open(os.path.join(FIXTURES_DIR, 'jwks.json')) as f:
+        kid = json.load(f)['keys'][0]['kid']
+    with open(os.path.join(FIXTURES_DIR, 'jwks_private_key.pem')) as f:
+        private_key = f.read()
+    return jwt.encode({
+        'iss': f'https://{DOMAIN}/',
+        'aud': AUDIENCE,
+        'exp': int(time.time()) + 3600,
+        'permissions': ['get:actor', 'get:actors', 'get:movie',
+                        'get:movies']
+    }, private_key, algorithm='RS256', headers={'kid': kid})
+
+
+def seed(url, actors, movies):
+    os.environ.update(server_env(url))
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.execute(Actor.__table__.insert(), [
+            {'name': f'Actor {i}', 'age': 20 + i % 50,
+             'gender': Gender.FEMALE if i % 2 else Gender.MALE}
+            for i in range(1, actors + 1)])
+        db.session.execute(Movie.__table__.insert(), [
+            {'title': f'Movie {i}', 'release_date': datetime(2020, 1, 1)}
+            for i in range(1, movies + 1)])
+        db.session.execute(movie_actors_table.insert(), [
+            {'movie_id': i, 'actor_id': j}
+            for i in range(1, movies + 1)
+            for j in range(i, min(i + 5, actors + 1))])
+        db.session.commit()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, workers, url):
+    if mode == 'sync':
+        command = ['gunicorn', '--workers', str(workers), '--bind',
+                   f'127.0.0.1:{port}', 'src.app:create_app()']
+    else:
+        command = [sys.executable, '-m', 'src.asgi', '--host', '127.0.0.1',
+                   '--port', str(port), '--workers', str(workers)]
+    process = subprocess.Popen(command, env=server_env(url),
+                               stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL,
+                               start_new_session=True)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.2).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    stop_server(process)
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def stop_server(process):
+    # Signal the whole session, the worker processes of a uvicorn
+    # supervisor do not exit when only the supervisor is terminated.
+    os.killpg(process.pid, signal.SIGTERM)
+    process.wait()
+
+
+def run_clients(port, token, concurrency, seconds):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+
+    def client(index):
+        conn = HTTPConnection('127.0.0.1', port, timeout=30)
+        own = []
+        count = index
+        while time.monotonic() < deadline:
+            path = PATHS[count % len(PATHS)]
+            count += 1
+            started = time.perf_counter()
+            try:
+                conn.request('GET', path, headers={
+                    'Authorization': f'Bearer {token}'})
+                response = conn.getresponse()
+                response.read()
+                ok = response.status == 200
+            except OSError:
+                conn.close()
+                conn = HTTPConnection('127.0.0.1', port, timeout=30)
+                ok = False
+            if ok:
+                own.append((time.perf_counter() - started) * 1000)
+            else:
+                with lock:
+                    errors[0] += 1
+        conn.close()
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=client, args=(index,))
+               for index in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests_per_second': len(latencies) / elapsed,
+        'errors': errors[0],
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99)
+    }
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='database url, defaults to a '
+                                      'temporary SQLite file')
+    parser.add_argument('--modes', nargs='+', default=['sync', 'asgi'],
+                        choices=['sync', 'asgi'])
+    parser.add_argument('--workers', type=int, default=2,
+                        help='server processes for each mode')
+    parser.add_argument('--concurrency', type=int, nargs='+',
+                        default=[8, 64])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--actors', type=int, default=5000)
+    parser.add_argument('--movies', type=int, default=1000)
+    args = parser.parse_args()
+    path = None
+    if not args.url:
+        fd, path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        args.url = f'sqlite:///{path}'
+    try:
+        seed(args.url, args.actors, args.movies)
+        token = make_token()
+        print(f"{'mode':<6}{'clients':>8}{'req/s':>10}{'p50 ms':>10}"
+              f"{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}")
+        for mode in args.modes:
+            port = free_port()
+            process = start_server(mode, port, args.workers, args.url)
+            try:
+                for concurrency in args.concurrency:
+                    result = run_clients(port, token, concurrency,
+                                         args.seconds)
+                    print(f"{mode:<6}{concurrency:>8}"
+                          f"{result['requests_per_second']:>10.0f}"
+                          f"{result['p50_ms']:>10.1f}"
+                          f"{result['p95_ms']:>10.1f}"
+                          f"{result['p99_ms']:>10.1f}"
+                          f"{result['errors']:>8}")
+            finally:
+                stop_server(process)
+    finally:
+        if path:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
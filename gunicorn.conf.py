@@ -0,0 +1,18 @@
+import os
+import shutil
+
+from prometheus_client import multiprocess
+
+
+def on_starting(server):
+    # Samples left over from a previous run would be added to the new
+    # workers' counters.
+    path = os.environ.get('prometheus_multiproc_dir')
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+
+
+def child_exit(server, worker):
+    if os.environ.get('prometheus_multiproc_dir'):
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,33 @@
+"""table versions
+
+Revision ID: 3b3a0facb58e
+Revises: 5b7ed99cd4e6
+Create Date: 2026-10-18 10:12:40.218733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b3a0facb58e'
+down_revision = '5b7ed99cd4e6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    table_versions = op.create_table('table_versions',
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('table_name')
+    )
+    op.bulk_insert(table_versions, [
+        {'table_name': 'actors', 'version': 0},
+        {'table_name': 'movies', 'version': 0},
+        {'table_name': 'movie_actors', 'version': 0}
+    ])
+
+
+def downgrade():
+    op.drop_table('table_versions')
@@ -0,0 +1,35 @@
+"""association and filter indexes
+
+Revision ID: 9c41d2e7a8f0
+Revises: 3b3a0facb58e
+Create Date: 2026-10-18 11:02:17.604512
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '9c41d2e7a8f0'
+down_revision = '3b3a0facb58e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_movie_actors_actor_id_movie_id', 'movie_actors',
+                    ['actor_id', 'movie_id'], unique=False)
+    op.create_index(op.f('ix_actors_name'), 'actors', ['name'], unique=False)
+    op.create_index(op.f('ix_actors_age'), 'actors', ['age'], unique=False)
+    op.create_index(op.f('ix_movies_title'), 'movies', ['title'],
+                    unique=False)
+    op.create_index(op.f('ix_movies_release_date'), 'movies',
+                    ['release_date'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_movies_release_date'), table_name='movies')
+    op.drop_index(op.f('ix_movies_title'), table_name='movies')
+    op.drop_index(op.f('ix_actors_age'), table_name='actors')
+    op.drop_index(op.f('ix_actors_name'), table_name='actors')
+    op.drop_index('ix_movie_actors_actor_id_movie_id',
+                  table_name='movie_actors')
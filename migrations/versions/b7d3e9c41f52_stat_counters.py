@@ -0,0 +1,47 @@
+"""stat counters
+
+Revision ID: b7d3e9c41f52
+Revises: e4f8a1b6c203
+Create Date: 2026-10-18 14:21:37.904512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e9c41f52'
+down_revision = 'e4f8a1b6c203'
+branch_labels = None
+depends_on = None
+
+# Frozen at this revision, the backfill must not follow later models.
+actors = sa.table('actors', sa.column('gender', sa.String()))
+movies = sa.table('movies', sa.column('release_date', sa.DateTime()))
+
+
+def upgrade():
+    stat_counters = op.create_table('stat_counters',
+    sa.Column('name', sa.String(), nullable=False),
+    sa.Column('key', sa.String(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name', 'key')
+    )
+    connection = op.get_bind()
+    gender = actors.c.gender
+    year = sa.extract('year', movies.c.release_date)
+    rows = [
+        {'name': 'actors_by_gender', 'key': value.lower(), 'count': count}
+        for value, count in connection.execute(
+            sa.select([gender, sa.func.count()]).group_by(gender))
+    ] + [
+        {'name': 'movies_by_year', 'key': str(int(value)), 'count': count}
+        for value, count in connection.execute(
+            sa.select([year, sa.func.count()]).group_by(year))
+    ]
+    if rows:
+        op.bulk_insert(stat_counters, rows)
+
+
+def downgrade():
+    op.drop_table('stat_counters')
@@ -0,0 +1,28 @@
+"""title pattern index
+
+Revision ID: d2a6c8f1e3b9
+Revises: b7d3e9c41f52
+Create Date: 2026-10-18 17:40:12.318204
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2a6c8f1e3b9'
+down_revision = 'b7d3e9c41f52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Serves title LIKE 'prefix%' whatever the database collation, other
+    # databases have no operator classes.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE INDEX ix_movies_title_pattern '
+                   'ON movies (title text_pattern_ops)')
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX ix_movies_title_pattern')
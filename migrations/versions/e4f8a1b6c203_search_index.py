@@ -0,0 +1,108 @@
+"""search index
+
+Revision ID: e4f8a1b6c203
+Revises: 9c41d2e7a8f0
+Create Date: 2026-10-18 11:48:05.337120
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f8a1b6c203'
+down_revision = '9c41d2e7a8f0'
+branch_labels = None
+depends_on = None
+
+# Frozen at this revision, src.search holds the current schema.
+SQLITE_DDL = [
+    'CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(kind '
+    "UNINDEXED, ref_id UNINDEXED, body, tokenize='unicode61')",
+    'CREATE TRIGGER IF NOT EXISTS actors_search_insert AFTER INSERT ON '
+    'actors BEGIN INSERT INTO search_index (rowid, kind, ref_id, body) '
+    "VALUES (new.id * 2 + 0, 'actor', new.id, new.name); END",
+    'CREATE TRIGGER IF NOT EXISTS actors_search_update AFTER UPDATE OF '
+    'name ON actors BEGIN UPDATE search_index SET body = new.name WHERE '
+    'rowid = old.id * 2 + 0; END',
+    'CREATE TRIGGER IF NOT EXISTS actors_search_delete AFTER DELETE ON '
+    'actors BEGIN DELETE FROM search_index WHERE rowid = old.id * 2 + 0; '
+    'END',
+    'CREATE TRIGGER IF NOT EXISTS movies_search_insert AFTER INSERT ON '
+    'movies BEGIN INSERT INTO search_index (rowid, kind, ref_id, body) '
+    "VALUES (new.id * 2 + 1, 'movie', new.id, new.title); END",
+    'CREATE TRIGGER IF NOT EXISTS movies_search_update AFTER UPDATE OF '
+    'title ON movies BEGIN UPDATE search_index SET body = new.title WHERE '
+    'rowid = old.id * 2 + 1; END',
+    'CREATE TRIGGER IF NOT EXISTS movies_search_delete AFTER DELETE ON '
+    'movies BEGIN DELETE FROM search_index WHERE rowid = old.id * 2 + 1; '
+    'END',
+    'INSERT INTO search_index (rowid, kind, ref_id, body) SELECT id * 2 + '
+    "0, 'actor', id, name FROM actors",
+    'INSERT INTO search_index (rowid, kind, ref_id, body) SELECT id * 2 + '
+    "1, 'movie', id, title FROM movies"
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS actors_search_insert',
+    'DROP TRIGGER IF EXISTS actors_search_update',
+    'DROP TRIGGER IF EXISTS actors_search_delete',
+    'DROP TRIGGER IF EXISTS movies_search_insert',
+    'DROP TRIGGER IF EXISTS movies_search_update',
+    'DROP TRIGGER IF EXISTS movies_search_delete',
+    'DROP TABLE IF EXISTS search_index'
+]
+
+POSTGRES_DDL = [
+    'CREATE TABLE IF NOT EXISTS search_index (kind VARCHAR NOT NULL, '
+    'ref_id INTEGER NOT NULL, body VARCHAR NOT NULL, document TSVECTOR NOT '
+    'NULL, PRIMARY KEY (kind, ref_id))',
+    'CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index '
+    'USING GIN (document)',
+    'CREATE OR REPLACE FUNCTION actors_search_sync() RETURNS trigger AS $$ '
+    "BEGIN IF TG_OP = 'DELETE' THEN DELETE FROM search_index WHERE kind = "
+    "'actor' AND ref_id = OLD.id; RETURN OLD; END IF; INSERT INTO "
+    "search_index (kind, ref_id, body, document) VALUES ('actor', NEW.id, "
+    "NEW.name, to_tsvector('simple', NEW.name)) ON CONFLICT (kind, ref_id) "
+    'DO UPDATE SET body = EXCLUDED.body, document = EXCLUDED.document; '
+    'RETURN NEW; END $$ LANGUAGE plpgsql',
+    'DROP TRIGGER IF EXISTS actors_search_sync ON actors',
+    'CREATE TRIGGER actors_search_sync AFTER INSERT OR UPDATE OF name OR '
+    'DELETE ON actors FOR EACH ROW EXECUTE FUNCTION actors_search_sync()',
+    'CREATE OR REPLACE FUNCTION movies_search_sync() RETURNS trigger AS $$ '
+    "BEGIN IF TG_OP = 'DELETE' THEN DELETE FROM search_index WHERE kind = "
+    "'movie' AND ref_id = OLD.id; RETURN OLD; END IF; INSERT INTO "
+    "search_index (kind, ref_id, body, document) VALUES ('movie', NEW.id, "
+    "NEW.title, to_tsvector('simple', NEW.title)) ON CONFLICT (kind, "
+    'ref_id) DO UPDATE SET body = EXCLUDED.body, document = '
+    'EXCLUDED.document; RETURN NEW; END $$ LANGUAGE plpgsql',
+    'DROP TRIGGER IF EXISTS movies_search_sync ON movies',
+    'CREATE TRIGGER movies_search_sync AFTER INSERT OR UPDATE OF title OR '
+    'DELETE ON movies FOR EACH ROW EXECUTE FUNCTION movies_search_sync()',
+    'INSERT INTO search_index (kind, ref_id, body, document) SELECT '
+    "'actor', id, name, to_tsvector('simple', name) FROM actors ON "
+    'CONFLICT DO NOTHING',
+    'INSERT INTO search_index (kind, ref_id, body, document) SELECT '
+    "'movie', id, title, to_tsvector('simple', title) FROM movies ON "
+    'CONFLICT DO NOTHING'
+]
+
+POSTGRES_DROP = [
+    'DROP TRIGGER IF EXISTS actors_search_sync ON actors',
+    'DROP FUNCTION IF EXISTS actors_search_sync()',
+    'DROP TRIGGER IF EXISTS movies_search_sync ON movies',
+    'DROP FUNCTION IF EXISTS movies_search_sync()',
+    'DROP TABLE IF EXISTS search_index'
+]
+
+UPGRADE = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}
+DOWNGRADE = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+
+
+def upgrade():
+    for statement in UPGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
+
+
+def downgrade():
+    for statement in DOWNGRADE.get(op.get_bind().dialect.name, []):
+        op.execute(statement)
@@ -0,0 +1,33 @@
+"""cast changes
+
+Revision ID: f1c7b3a9d052
+Revises: d2a6c8f1e3b9
+Create Date: 2026-10-18 18:25:03.771940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c7b3a9d052'
+down_revision = 'd2a6c8f1e3b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('cast_changes',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('version', sa.Integer(), nullable=False),
+    sa.Column('table_name', sa.String(), nullable=False),
+    sa.Column('row_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cast_changes_version'), 'cast_changes',
+                    ['version'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_cast_changes_version'), table_name='cast_changes')
+    op.drop_table('cast_changes')
@@ -1,32 +1,131 @@
 import sys
 
 from flask_sqlalchemy import SQLAlchemy
-from flask import Blueprint, jsonify, request, abort
+from flask import Blueprint, abort, g
 
+from src.serialization import render, request_data
 from src.models import Actor, Gender, Movie
 from src.auth import requires_auth
+from src.cache import entity_cache
+from src.replicas import read_only
+from src.graph import cast_graph
+from src.api.pagination import (
+    page_args, paginate, wants_all, encode_cursor)
+from src.api.params import field_args, sort_args, int_arg, choice_arg
+from src.api.caching import conditional
+from src.api.streaming import stream_args, stream_response
+from src.api.batch import batch_create, id_list
 
 
 db = SQLAlchemy()
 bp = Blueprint('api_actors', __name__, url_prefix='/api')
 
+SORTABLE = ('id', 'name', 'age')
+
+
+def actor_filters():
+    criteria = []
+    gender = choice_arg('gender', [member.lower()
+                                   for member in Gender.__members__])
+    if gender is not None:
+        criteria.append(Actor.gender == Gender[gender.upper()])
+    age_min = int_arg('age_min')
+    if age_min is not None:
+        criteria.append(Actor.age >= age_min)
+    age_max = int_arg('age_max')
+    if age_max is not None:
+        criteria.append(Actor.age <= age_max)
+    return criteria
+
 
 @bp.route('/actors/<int:actor_id>', methods=['GET'])
 @requires_auth('get:actor')
+@read_only
+@conditional('actors', 'movie_actors')
 def get_actor(actor_id):
-    actor = Actor.query.get(actor_id)
+    fields = field_args(Actor)
+    # Only complete rows are cached, a miss for a subset of the fields
+    # reads just those columns.
+    actor = entity_cache.get_or_load(
+        'actors', actor_id, lambda: Actor.load_formatted(actor_id, fields),
+        versions=g.table_versions, store=fields == Actor.FIELDS)
     if not actor:
         abort(404, description='Actor not found')
-    return jsonify(actor.format())
+    return render({field: actor[field] for field in fields})
+
+
+@bp.route('/actors/<int:actor_id>/costars', methods=['GET'])
+@requires_auth('get:actors')
+@read_only
+@conditional('actors', 'movie_actors')
+def get_costars(actor_id):
+    limit, cursor = page_args()
+    offset = cursor[0] if cursor else 0
+    if not isinstance(offset, int) or offset < 0:
+        abort(400, 'Invalid cursor')
+    rows = Actor.costars(actor_id, limit + 1, offset)
+    if not rows and not Actor.query.filter(Actor.id == actor_id).count():
+        abort(404, 'Actor not found')
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([offset + limit])
+    return render({
+        'costars': [{
+            'id': row_id,
+            'name': name,
+            'shared_movies': shared_movies
+        } for row_id, name, shared_movies in rows],
+        'next_cursor': next_cursor
+    })
+
+
+@bp.route('/actors/<int:actor_id>/path/<int:other_id>', methods=['GET'])
+@requires_auth('get:actors')
+@read_only
+@conditional('actors', 'movie_actors')
+def get_actor_path(actor_id, other_id):
+    if Actor.query.filter(Actor.id.in_({actor_id, other_id})).count() \
+            != len({actor_id, other_id}):
+        abort(404, 'Actor not found')
+    path = cast_graph().shortest_path(actor_id, other_id)
+    if path is None:
+        abort(404, 'Actors are not connected')
+    actors, movies = path
+    return render({
+        'degrees': len(movies),
+        'actors': actors,
+        'movies': movies
+    })
 
 
 @bp.route('/actors', methods=['GET'])
 @requires_auth('get:actors')
+@read_only
+@conditional('actors', 'movie_actors')
 def get_actors():
-    actors = Actor.query.all()
-    if not actors:
+    fields = field_args(Actor)
+    sort = sort_args(Actor, SORTABLE)
+    criteria = actor_filters()
+    query = Actor.query.with_entities(
+        *sort.columns(Actor.select_fields(fields))).filter(*criteria)
+    stream = stream_args()
+    if stream:
+        return stream_response(query, Actor, fields, stream, sort)
+    if wants_all():
+        actors = query.order_by(*sort.order_by()).all()
+        if not actors and not criteria:
+            abort(404, 'No Actors added yet')
+        return render(Actor.format_many(
+            actors, fields, all_rows=not criteria))
+    limit, cursor = page_args()
+    actors, next_cursor = paginate(query, limit, sort, cursor)
+    if not actors and cursor is None and not criteria:
         abort(404, 'No Actors added yet')
-    return jsonify([actor.format() for actor in actors])
+    return render({
+        'actors': Actor.format_many(actors, fields),
+        'next_cursor': next_cursor
+    })
 
 
 @bp.route('/actors/<int:actor_id>', methods=['DELETE'])
@@ -37,7 +136,7 @@ def delete_actor(actor_id):
         abort(404, 'Actor not found')
     try:
         actor.delete()
-        return jsonify({
+        return render({
             'success': True
         })
     except Exception:
@@ -49,7 +148,7 @@ def delete_actor(actor_id):
 @bp.route('/actors', methods=['POST'])
 @requires_auth('post:actor')
 def post_actor():
-    post_data = request.get_json()
+    post_data = request_data()
     try:
         actor = Actor(
             post_data['name'],
@@ -59,7 +158,7 @@ def post_actor():
         actor.movies = Movie.query.filter(
             Movie.id.in_(post_data.get('movies', []))).all()
         actor.insert()
-        return jsonify({
+        return render({
             'success': True,
             'actor_id': actor.id
         })
@@ -69,10 +168,31 @@ def post_actor():
         abort(422, 'Unprocessable request to add new Actor')
 
 
+def parse_actor(post_data):
+    name = post_data['name']
+    if not isinstance(name, str) or not name:
+        raise ValueError('name must be a non-empty string')
+    age = post_data['age']
+    if not isinstance(age, int) or isinstance(age, bool) or age < 0:
+        raise ValueError('age must be a non-negative integer')
+    gender = post_data['gender']
+    if not isinstance(gender, str) or gender.upper() not in Gender.__members__:
+        raise ValueError('gender must be one of: ' + ', '.join(
+            member.lower() for member in Gender.__members__))
+    row = {'name': name, 'age': age, 'gender': Gender[gender.upper()]}
+    return row, id_list(post_data.get('movies', []), 'movies')
+
+
+@bp.route('/actors/batch', methods=['POST'])
+@requires_auth('post:actor')
+def post_actors_batch():
+    return batch_create(Actor, Movie, 'actors', parse_actor)
+
+
 @bp.route('/actors/<int:actor_id>', methods=['PATCH'])
 @requires_auth('patch:actor')
 def patch_actor(actor_id):
-    patch_data = request.get_json()
+    patch_data = request_data()
     actor = Actor.query.get(actor_id)
     if not actor:
         abort(404, 'Actor not found')
@@ -81,10 +201,15 @@ def patch_actor(actor_id):
         actor.age = patch_data.get('age', actor.age)
         actor.gender = Gender[patch_data.get(
             'gender', actor.gender.name).upper()]
-        actor.movies = Movie.query.filter(
-            Movie.id.in_(patch_data.get('movies', []))).all()
+        Actor.update_links(
+            actor_id,
+            replace=id_list(patch_data['movies'], 'movies')
+            if 'movies' in patch_data else None,
+            add=id_list(patch_data.get('add_movies', []), 'add_movies'),
+            remove=id_list(patch_data.get('remove_movies', []),
+                           'remove_movies'))
         actor.update()
-        return jsonify({
+        return render({
             'success': True
         })
     except Exception:
@@ -0,0 +1,73 @@
+import sys
+
+from flask import current_app, abort
+
+from src.serialization import render, request_data
+from src.models import db
+
+
+BATCH_MODES = ('atomic', 'best_effort')
+
+
+def batch_create(model, linked_model, key, parse_item):
+    post_data = request_data()
+    items = post_data.get(key) if isinstance(post_data, dict) else None
+    if not isinstance(items, list) or not items:
+        abort(400, f'Expected a non-empty list of {key}')
+    if len(items) > current_app.config['MAX_BATCH_SIZE']:
+        abort(400, f"Batches are limited to "
+                   f"{current_app.config['MAX_BATCH_SIZE']} {key}")
+    mode = post_data.get('mode', 'atomic')
+    if mode not in BATCH_MODES:
+        abort(400, 'Invalid batch mode')
+
+    results = []
+    parsed = []
+    for index, item in enumerate(items):
+        try:
+            parsed.append((index, *parse_item(item)))
+            results.append({'index': index})
+        except KeyError as e:
+            results.append({'index': index,
+                            'error': f'Missing field: {e.args[0]}'})
+        except (TypeError, ValueError, AttributeError) as e:
+            results.append({'index': index, 'error': str(e)})
+
+    failed = len(parsed) < len(items)
+    if failed and mode == 'atomic':
+        return render({
+            'success': False,
+            'error': 422,
+            'message': f'Unprocessable batch of {key}',
+            'results': results
+        }), 422
+
+    if parsed:
+        # Unknown linked ids are ignored, as in the single item endpoints.
+        referenced = set(linked_id for _, _, linked in parsed
+                         for linked_id in linked)
+        existing = set(row_id for (row_id,) in db.session.query(
+            linked_model.id).filter(linked_model.id.in_(referenced)))
+        try:
+            ids = model.bulk_insert(
+                [row for _, row, _ in parsed],
+                [sorted(set(linked) & existing) for _, _, linked in parsed])
+        except Exception:
+            db.session.rollback()
+            print(sys.exc_info())
+            abort(422, f'Unprocessable batch of {key}')
+        for (index, _, _), row_id in zip(parsed, ids):
+            results[index]['id'] = row_id
+
+    return render({
+        'success': True,
+        'results': results
+    })
+
+
+def id_list(value, field):
+    if not isinstance(value, list) or not all(
+            isinstance(item, int) and not isinstance(item, bool)
+            for item in value):
+        raise ValueError(f'{field} must be a list of ids')
+    return value
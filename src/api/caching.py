@@ -0,0 +1,38 @@
+import hashlib
+from functools import wraps
+
+from flask import request, make_response, current_app, g
+
+from src.models import TableVersion
+from src.serialization import response_format
+
+
+def compute_etag(tables, versions=None):
+    if versions is None:
+        versions = TableVersion.current(*tables)
+    key = '|'.join(f'{table}:{versions.get(table, 0)}' for table in tables)
+    # Each representation (JSON, MessagePack) gets its own strong tag.
+    return hashlib.sha1(
+        f'{key}|{request.full_path}|{response_format()}'.encode()
+    ).hexdigest()
+
+
+def conditional(*tables):
+    def conditional_decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            # The view can tag cached entries with the same versions.
+            g.table_versions = TableVersion.current(*tables)
+            etag = compute_etag(tables, g.table_versions)
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag)
+            response.vary.add('Accept')
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return conditional_decorator
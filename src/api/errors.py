@@ -1,4 +1,6 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint
+
+from src.serialization import render
 
 
 bp = Blueprint('api_errors', __name__)
@@ -6,7 +8,7 @@ bp = Blueprint('api_errors', __name__)
 
 @bp.app_errorhandler(400)
 def bad_request(e):
-    return jsonify({
+    return render({
         'success': False,
         'error': 400,
         'message': e.description
@@ -15,7 +17,7 @@ def bad_request(e):
 
 @bp.app_errorhandler(401)
 def unauthorized(e):
-    return jsonify({
+    return render({
         'success': False,
         'error': 401,
         'message': e.description
@@ -24,7 +26,7 @@ def unauthorized(e):
 
 @bp.app_errorhandler(403)
 def forbidden(e):
-    return jsonify({
+    return render({
         'success': False,
         'error': 403,
         'message': e.description
@@ -33,7 +35,7 @@ def forbidden(e):
 
 @bp.app_errorhandler(404)
 def not_found(e):
-    return jsonify({
+    return render({
         'success': False,
         'error': 404,
         'message': e.description
@@ -42,16 +44,25 @@ def not_found(e):
 
 @bp.app_errorhandler(405)
 def method_not_allowed(e):
-    return jsonify({
+    return render({
         'success': False,
         'error': 405,
         'message': e.description
     }), 404
 
 
+@bp.app_errorhandler(415)
+def unsupported_media_type(e):
+    return render({
+        'success': False,
+        'error': 415,
+        'message': e.description
+    }), 415
+
+
 @bp.app_errorhandler(422)
 def unprocessable_entity(e):
-    return jsonify({
+    return render({
         'success': False,
         'error': 422,
         'message': e.description
@@ -60,7 +71,7 @@ def unprocessable_entity(e):
 
 @bp.app_errorhandler(500)
 def internal_server_error(e):
-    return jsonify({
+    return render({
         'success': False,
         'error': 500,
         'message': e.description
@@ -1,33 +1,88 @@
 import sys
-from datetime import date
+from datetime import date, datetime, time, timedelta
 
 from flask_sqlalchemy import SQLAlchemy
-from flask import Blueprint, jsonify, abort, request
+from flask import Blueprint, abort, g, request
 
+from src.serialization import render, request_data
 from src.models import Actor, Movie
 from src.auth import requires_auth
+from src.cache import entity_cache
+from src.replicas import read_only
+from src.api.pagination import page_args, paginate, wants_all
+from src.api.params import field_args, sort_args, date_arg
+from src.api.caching import conditional
+from src.api.streaming import stream_args, stream_response
+from src.api.batch import batch_create, id_list
 
 
 db = SQLAlchemy()
 bp = Blueprint('api_movies', __name__, url_prefix='/api')
 
+SORTABLE = ('id', 'title', 'release_date')
+
+
+def movie_filters():
+    criteria = []
+    release_from = date_arg('release_from')
+    if release_from is not None:
+        criteria.append(
+            Movie.release_date >= datetime.combine(release_from, time()))
+    release_to = date_arg('release_to')
+    if release_to is not None:
+        criteria.append(Movie.release_date < datetime.combine(
+            release_to + timedelta(days=1), time()))
+    title_prefix = request.args.get('title_prefix')
+    if title_prefix:
+        if '\0' in title_prefix:
+            abort(400, 'Invalid title_prefix')
+        criteria.append(Movie.title_prefix(title_prefix))
+    return criteria
+
 
 @bp.route('/movies/<int:movie_id>', methods=['GET'])
 @requires_auth('get:movie')
+@read_only
+@conditional('movies', 'movie_actors')
 def get_movie(movie_id):
-    movie = Movie.query.get(movie_id)
+    fields = field_args(Movie)
+    # Only complete rows are cached, a miss for a subset of the fields
+    # reads just those columns.
+    movie = entity_cache.get_or_load(
+        'movies', movie_id, lambda: Movie.load_formatted(movie_id, fields),
+        versions=g.table_versions, store=fields == Movie.FIELDS)
     if not movie:
         abort(404, 'Movie not found')
-    return jsonify(movie.format())
+    return render({field: movie[field] for field in fields})
 
 
 @bp.route('/movies', methods=['GET'])
 @requires_auth('get:movies')
+@read_only
+@conditional('movies', 'movie_actors')
 def get_movies():
-    movies = Movie.query.all()
-    if not movies:
+    fields = field_args(Movie)
+    sort = sort_args(Movie, SORTABLE)
+    criteria = movie_filters()
+    query = Movie.query.with_entities(
+        *sort.columns(Movie.select_fields(fields))).filter(*criteria)
+    stream = stream_args()
+    if stream:
+        return stream_response(query, Movie, fields, stream, sort)
+    if wants_all():
+        movies = query.order_by(*sort.order_by()).all()
+        if not movies and not criteria:
+            abort(404, 'No movies added yet')
+        return render(Movie.format_many(
+            movies, fields, all_rows=not criteria))
+    limit, cursor = page_args()
+    movies, next_cursor = paginate(query, limit, sort, cursor)
+    if not movies and cursor is None and not criteria:
         abort(404, 'No movies added yet')
-    return jsonify([movie.format() for movie in movies])
+    return render({
+        'movies': Movie.format_many(movies, fields),
+        'next_cursor': next_cursor
+    })
 
 
 @bp.route('/movies/<int:movie_id>', methods=['DELETE'])
@@ -38,7 +93,7 @@ def delete_movie(movie_id):
         abort(404, 'Movie not found')
     try:
         movie.delete()
-        return jsonify({
+        return render({
             'success': True
         })
     except Exception:
@@ -50,7 +105,7 @@ def delete_movie(movie_id):
 @bp.route('/movies', methods=['POST'])
 @requires_auth('post:movie')
 def post_movie():
-    post_data = request.get_json()
+    post_data = request_data()
     try:
         movie = Movie(
             post_data['title'],
@@ -59,7 +114,7 @@ def post_movie():
         movie.actors = Actor.query.filter(
             Actor.id.in_(post_data.get('actors', []))).all()
         movie.insert()
-        return jsonify({
+        return render({
             'success': True,
             'movie_id': movie.id
         })
@@ -69,10 +124,27 @@ def post_movie():
         abort(422, 'Unprocessable request to add new Movie')
 
 
+def parse_movie(post_data):
+    title = post_data['title']
+    if not isinstance(title, str) or not title:
+        raise ValueError('title must be a non-empty string')
+    release_date = post_data['release_date']
+    if not isinstance(release_date, str):
+        raise ValueError('release_date must be an ISO date string')
+    row = {'title': title, 'release_date': date.fromisoformat(release_date)}
+    return row, id_list(post_data.get('actors', []), 'actors')
+
+
+@bp.route('/movies/batch', methods=['POST'])
+@requires_auth('post:movie')
+def post_movies_batch():
+    return batch_create(Movie, Actor, 'movies', parse_movie)
+
+
 @bp.route('/movies/<int:movie_id>', methods=['PATCH'])
 @requires_auth('patch:movie')
 def patch_movie(movie_id):
-    patch_data = request.get_json()
+    patch_data = request_data()
     movie = Movie.query.get(movie_id)
     if not movie:
         abort(404, 'Movie not found')
@@ -80,10 +152,15 @@ def patch_movie(movie_id):
         movie.title = patch_data.get('title', movie.title)
         movie.release_date = date.fromisoformat(patch_data.get(
             'release_date', movie.release_date.date().isoformat()))
-        movie.actors = Actor.query.filter(
-            Actor.id.in_(patch_data.get('actors', []))).all()
+        Movie.update_links(
+            movie_id,
+            replace=id_list(patch_data['actors'], 'actors')
+            if 'actors' in patch_data else None,
+            add=id_list(patch_data.get('add_actors', []), 'add_actors'),
+            remove=id_list(patch_data.get('remove_actors', []),
+                           'remove_actors'))
         movie.update()
-        return jsonify({
+        return render({
             'success': True
         })
     except Exception:
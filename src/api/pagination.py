@@ -0,0 +1,136 @@
+import json
+import base64
+import binascii
+from collections import namedtuple
+from datetime import date, datetime
+
+from flask import current_app, request, abort
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(values):
+    data = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor):
+    try:
+        data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(data)
+    except (ValueError, binascii.Error):
+        abort(400, 'Invalid cursor')
+    if not isinstance(values, list) or not values:
+        abort(400, 'Invalid cursor')
+    return values
+
+
+def wants_all():
+    return request.args.get('all', '').lower() in ('1', 'true', 'yes')
+
+
+def page_args():
+    max_page_size = current_app.config['MAX_PAGE_SIZE']
+    try:
+        limit = int(request.args.get(
+            'limit', current_app.config['PAGE_SIZE']))
+    except ValueError:
+        abort(400, 'Invalid limit')
+    if limit < 1:
+        abort(400, 'Invalid limit')
+    limit = min(limit, max_page_size)
+    cursor = request.args.get('cursor')
+    return limit, decode_cursor(cursor) if cursor else None
+
+
+class Sort(namedtuple('Sort', 'spec column id_column descending')):
+    @classmethod
+    def by_id(cls, model):
+        return cls('id', model.id, model.id, False)
+
+    @property
+    def by_id_only(self):
+        return self.column is self.id_column
+
+    def order_by(self):
+        if self.by_id_only:
+            # A repeated ORDER BY id makes SQLite sort grouped queries
+            # instead of reading them in index order.
+            return (self.id_column.desc() if self.descending
+                    else self.id_column,)
+        if self.descending:
+            return self.column.desc(), self.id_column.desc()
+        return self.column, self.id_column
+
+    def after(self, value, row_id):
+        if self.by_id_only:
+            return self.id_column < row_id if self.descending \
+                else self.id_column > row_id
+        if self.descending:
+            return or_(self.column < value,
+                       and_(self.column == value, self.id_column < row_id))
+        return or_(self.column > value,
+                   and_(self.column == value, self.id_column > row_id))
+
+    def key(self, row):
+        return getattr(row, self.column.key), row.id
+
+    def encode(self, row):
+        value, row_id = self.key(row)
+        if self.by_id_only:
+            return encode_cursor([row_id])
+        if isinstance(value, (datetime, date)):
+            value = value.isoformat()
+        return encode_cursor([row_id, value, self.spec])
+
+    def decode(self, cursor):
+        if self.by_id_only and len(cursor) == 1:
+            row_id, value = cursor[0], cursor[0]
+        elif len(cursor) == 3 and cursor[2] == self.spec:
+            row_id, value = cursor[0], cursor[1]
+            python_type = self.column.type.python_type
+            if python_type is datetime:
+                try:
+                    value = datetime.fromisoformat(value)
+                except (TypeError, ValueError):
+                    abort(400, 'Invalid cursor')
+            # Postgres rejects comparing the column with another type.
+            elif type(value) is not python_type:
+                abort(400, 'Invalid cursor')
+        else:
+            abort(400, 'Invalid cursor')
+        # Not isinstance, JSON true would pass as an int.
+        if type(row_id) is not int:
+            abort(400, 'Invalid cursor')
+        return value, row_id
+
+    def columns(self, columns):
+        if any(column is self.column for column in columns):
+            return columns
+        return columns + [self.column]
+
+
+def seek(query, limit, sort, after=None):
+    if after is not None:
+        query = query.filter(sort.after(*after))
+    return query.order_by(*sort.order_by()).limit(limit).all()
+
+
+def iter_chunks(query, chunk_size, sort):
+    after = None
+    while True:
+        rows = seek(query, chunk_size, sort, after)
+        if rows:
+            yield rows
+        if len(rows) < chunk_size:
+            return
+        after = sort.key(rows[-1])
+
+
+def paginate(query, limit, sort, cursor=None):
+    after = sort.decode(cursor) if cursor is not None else None
+    rows = seek(query, limit + 1, sort, after)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = sort.encode(rows[-1])
+    return rows, next_cursor
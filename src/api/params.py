@@ -0,0 +1,53 @@
+from datetime import date
+
+from flask import request, abort
+
+from src.api.pagination import Sort
+
+
+def field_args(model):
+    fields = request.args.get('fields')
+    if not fields:
+        return model.FIELDS
+    requested = set(field.strip() for field in fields.split(','))
+    unknown = requested.difference(model.FIELDS)
+    if unknown:
+        abort(400, f"Invalid fields: {', '.join(sorted(unknown))}")
+    return tuple(field for field in model.FIELDS if field in requested)
+
+
+def sort_args(model, sortable):
+    spec = request.args.get('sort', 'id')
+    name = spec[1:] if spec.startswith('-') else spec
+    if name not in sortable:
+        abort(400, f"Invalid sort, use one of: {', '.join(sortable)}")
+    return Sort(spec, getattr(model, name), model.id, spec.startswith('-'))
+
+
+def int_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        abort(400, f'Invalid {name}, expected an integer')
+
+
+def date_arg(name):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        abort(400, f'Invalid {name}, expected an ISO date')
+
+
+def choice_arg(name, choices):
+    value = request.args.get(name)
+    if value is None:
+        return None
+    if value.lower() not in choices:
+        abort(400, f"Invalid {name}, use one of: {', '.join(choices)}")
+    return value.lower()
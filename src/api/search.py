@@ -0,0 +1,46 @@
+from flask import Blueprint, request, abort
+
+from src.serialization import render
+from src.auth import requires_auth
+from src.replicas import read_only
+from src.search import SEARCH_KINDS, search
+from src.api.pagination import page_args, encode_cursor
+from src.api.caching import conditional
+
+
+bp = Blueprint('api_search', __name__, url_prefix='/api')
+
+
+@bp.route('/search', methods=['GET'])
+@requires_auth('get:actors', 'get:movies')
+@read_only
+@conditional('actors', 'movies')
+def get_search():
+    query = request.args.get('q', '').strip()
+    if not query:
+        abort(400, 'Search query is required')
+    kinds = request.args.get('type')
+    if kinds is None:
+        kinds = tuple(SEARCH_KINDS)
+    elif kinds in SEARCH_KINDS:
+        kinds = (kinds,)
+    else:
+        abort(400, 'Invalid search type')
+    limit, cursor = page_args()
+    offset = cursor[0] if cursor else 0
+    if not isinstance(offset, int) or offset < 0:
+        abort(400, 'Invalid cursor')
+    rows = search(query, kinds, limit + 1, offset)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([offset + limit])
+    return render({
+        'results': [{
+            'type': kind,
+            'id': ref_id,
+            SEARCH_KINDS[kind][1]: body,
+            'rank': rank
+        } for kind, ref_id, body, rank in rows],
+        'next_cursor': next_cursor
+    })
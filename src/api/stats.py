@@ -0,0 +1,74 @@
+from flask import Blueprint
+from sqlalchemy import func
+
+from src.serialization import render
+from src.models import Actor, Gender, Movie, StatCounter, movie_actors_table
+from src.auth import requires_auth
+from src.replicas import read_only
+from src.api.pagination import Sort, page_args, paginate
+from src.api.caching import conditional
+
+
+bp = Blueprint('api_stats', __name__, url_prefix='/api/stats')
+
+
+@bp.route('/genders', methods=['GET'])
+@requires_auth('get:actors')
+@read_only
+@conditional('actors')
+def get_genders():
+    counts = StatCounter.current('actors_by_gender')
+    return render({'genders': {
+        member.lower(): counts.get(member.lower(), 0)
+        for member in Gender.__members__}})
+
+
+@bp.route('/release-years', methods=['GET'])
+@requires_auth('get:movies')
+@read_only
+@conditional('movies')
+def get_release_years():
+    counts = StatCounter.current('movies_by_year')
+    return render({'years': [
+        {'year': int(year), 'movies': counts[year]}
+        for year in sorted(counts, key=int)]})
+
+
+def link_counts(model, name_column, label):
+    # Grouped per page, so the cost follows the page size rather than the
+    # table size; rows without links count 0. Grouping by the primary key
+    # alone keeps the id index usable, the name depends on it.
+    key_column, value_column = (
+        movie_actors_table.c[name] for name in model.LINK_COLUMNS)
+    limit, cursor = page_args()
+    query = model.query.with_entities(
+        model.id, name_column, func.count(value_column).label(label)
+    ).outerjoin(movie_actors_table, key_column == model.id).group_by(
+        model.id)
+    return paginate(query, limit, Sort.by_id(model), cursor)
+
+
+@bp.route('/cast-sizes', methods=['GET'])
+@requires_auth('get:movies')
+@read_only
+@conditional('movies', 'movie_actors')
+def get_cast_sizes():
+    rows, next_cursor = link_counts(Movie, Movie.title, 'cast_size')
+    return render({
+        'movies': [{'id': row_id, 'title': title, 'cast_size': cast_size}
+                   for row_id, title, cast_size in rows],
+        'next_cursor': next_cursor
+    })
+
+
+@bp.route('/movie-counts', methods=['GET'])
+@requires_auth('get:actors')
+@read_only
+@conditional('actors', 'movie_actors')
+def get_movie_counts():
+    rows, next_cursor = link_counts(Actor, Actor.name, 'movies')
+    return render({
+        'actors': [{'id': row_id, 'name': name, 'movies': movies}
+                   for row_id, name, movies in rows],
+        'next_cursor': next_cursor
+    })
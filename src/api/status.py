@@ -0,0 +1,26 @@
+from flask import Blueprint
+
+from src.auth import requires_auth
+from src.serialization import render
+from src.models import db
+from src.cache import entity_cache
+from src.pool import pool_stats
+from src.token_cache import token_cache
+
+
+bp = Blueprint('api_status', __name__, url_prefix='/api/status')
+
+
+@bp.route('/caches', methods=['GET'])
+@requires_auth('get:status')
+def get_caches():
+    return render({
+        'entities': entity_cache.stats(),
+        'tokens': token_cache.stats()
+    })
+
+
+@bp.route('/pool', methods=['GET'])
+@requires_auth('get:status')
+def get_pool():
+    return render(pool_stats(db.engine))
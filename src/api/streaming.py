@@ -0,0 +1,38 @@
+from flask import current_app, request, abort, stream_with_context
+
+from src.serialization import dumps
+from src.api.pagination import iter_chunks
+
+
+STREAM_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson'
+}
+
+
+def stream_args():
+    stream = request.args.get('stream')
+    if stream is not None and stream not in STREAM_FORMATS:
+        abort(400, 'Invalid stream format')
+    return stream
+
+
+def stream_response(query, model, fields, stream, sort):
+    chunk_size = current_app.config['STREAM_CHUNK_SIZE']
+
+    def generate():
+        first = True
+        if stream == 'json':
+            yield b'['
+        for rows in iter_chunks(query, chunk_size, sort):
+            items = [dumps(item) for item in model.format_many(rows, fields)]
+            if stream == 'json':
+                yield (b'' if first else b',') + b','.join(items)
+            else:
+                yield b'\n'.join(items) + b'\n'
+            first = False
+        if stream == 'json':
+            yield b']'
+
+    return current_app.response_class(stream_with_context(generate()),
+                                      mimetype=STREAM_FORMATS[stream])
@@ -1,11 +1,20 @@
 import os
 
-from flask import Flask, jsonify
+from flask import Flask
 from flask_migrate import Migrate
 
 
 from src.models import db
-from src.api import actors, movies, errors
+from src.jwt_backend import select_backend
+from src.serialization import JSONEncoder, jsonify, select_json_backend
+from src.pool import engine_options
+from src.replicas import replica_binds, init_replicas
+from src.cache import entity_cache, create_backend
+from src.metrics import init_metrics
+from src.catalog import cli as catalog_cli
+from src.graph import init_graph
+from src.api import actors, movies, errors, search, stats, status
+from src.search import include_object
 
 
 migrate = Migrate()
@@ -13,14 +22,37 @@ migrate = Migrate()
 
 def create_app():
     app = Flask(__name__)
+    app.json_encoder = JSONEncoder
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(
+        app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(
+        os.environ.get('DATABASE_REPLICA_URLS'))
+    app.config['PAGE_SIZE'] = int(os.environ.get('PAGE_SIZE', 50))
+    app.config['MAX_PAGE_SIZE'] = int(os.environ.get('MAX_PAGE_SIZE', 200))
+    app.config['STREAM_CHUNK_SIZE'] = int(
+        os.environ.get('STREAM_CHUNK_SIZE', 500))
+    app.config['MAX_BATCH_SIZE'] = int(os.environ.get('MAX_BATCH_SIZE', 1000))
+    select_backend()
+    select_json_backend()
+    entity_cache.configure(create_backend(), ttl=float(
+        os.environ.get('ENTITY_CACHE_TTL', 60)))
     with app.app_context():
         db.init_app(app)
-        migrate.init_app(app, db)
+        init_replicas(
+            app, os.environ.get('DATABASE_REPLICA_STRATEGY', 'round_robin'),
+            float(os.environ.get('DATABASE_REPLICA_CHECK_INTERVAL', 10)))
+        migrate.init_app(app, db, include_object=include_object)
         app.register_blueprint(errors.bp)
         app.register_blueprint(actors.bp)
         app.register_blueprint(movies.bp)
+        app.register_blueprint(search.bp)
+        app.register_blueprint(stats.bp)
+        app.register_blueprint(status.bp)
+        init_metrics(app)
+        init_graph(app)
+        app.cli.add_command(catalog_cli)
 
         @app.route('/')
         @app.route('/api')
@@ -0,0 +1,103 @@
+import os
+import argparse
+import asyncio
+import logging
+
+import uvicorn
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+from src.app import create_app
+from src.jwks import jwks_store
+
+
+logger = logging.getLogger(__name__)
+
+
+def pool_capacity(app):
+    options = app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {}
+    return options.get('pool_size', 5) + max(0, options.get(
+        'max_overflow', 10))
+
+
+def wsgi_scope(scope):
+    # WSGIMiddleware copies the server port into the environ as an int,
+    # WSGI requires a string (Werkzeug builds the host from it when a
+    # request has no Host header).
+    if scope.get('server'):
+        host, port = scope['server']
+        scope = dict(scope, server=(host, str(port)))
+    return scope
+
+
+class Lifespan:
+    # uvicorn's WSGIMiddleware runs each view on a thread pool while
+    # connections and request bodies are handled on the event loop. This
+    # adds the lifespan events it does not handle, which keep the JWKS
+    # signing keys fresh in the background.
+    def __init__(self, app, jwks_refresh_interval=None):
+        self.app = app
+        self.jwks_refresh_interval = jwks_refresh_interval
+        self._jwks_task = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        else:
+            await self.app(wsgi_scope(scope), receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if self.jwks_refresh_interval:
+                    self._jwks_task = asyncio.ensure_future(
+                        self.refresh_jwks())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self._jwks_task:
+                    self._jwks_task.cancel()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def refresh_jwks(self):
+        # Requests only fetch the JWKS themselves for a key id they have
+        # not seen.
+        loop = asyncio.get_event_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, jwks_store.refresh)
+            except Exception:
+                logger.exception('JWKS refresh failed')
+            await asyncio.sleep(self.jwks_refresh_interval)
+
+
+def create_asgi_app(app=None, max_workers=None):
+    app = app or create_app()
+    # Views get one thread per pooled database connection.
+    return Lifespan(
+        WSGIMiddleware(app, workers=max_workers or pool_capacity(app)),
+        jwks_refresh_interval=max(1.0, jwks_store.ttl / 2))
+
+
+def __getattr__(name):
+    # `uvicorn src.asgi:app` builds the app on first access instead of on
+    # import, so importing this module does not need a configured database.
+    if name == 'app':
+        globals()['app'] = create_asgi_app()
+        return globals()['app']
+    raise AttributeError(name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the API over ASGI')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int,
+                        default=int(os.environ.get('PORT', 5000)))
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+    uvicorn.run('src.asgi:app', host=args.host, port=args.port,
+                workers=args.workers, lifespan='on')
+
+
+if __name__ == '__main__':
+    main()
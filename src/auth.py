@@ -1,12 +1,14 @@
 import os
 from functools import wraps
-import json
 import enum
 
 from flask import request, _request_ctx_stack, abort
-from urllib.request import urlopen
 from jose import jwt
 
+from src.jwks import jwks_store
+from src.token_cache import token_cache
+from src.metrics import AUTH_DURATION
+
 
 class UserRole(enum.Enum):
     CASTING_ASSISTANT = 1
@@ -46,29 +48,27 @@ class Auth:
         AUTH0_DOMAIN = os.environ.get('AUTH0_DOMAIN')
         API_AUDIENCE = os.environ.get('API_AUDIENCE')
         ALGORITHMS = os.environ.get('ALGORITHMS')
+        payload = token_cache.get(token)
+        if payload is not None:
+            return payload
         try:
-            jsonurl = urlopen(f'https://{AUTH0_DOMAIN}/.well-known/jwks.json')
-            jwks = json.loads(jsonurl.read())
             unverified_header = jwt.get_unverified_header(token)
-            rsa_key = {}
-            for key in jwks['keys']:
-                if key['kid'] == unverified_header['kid']:
-                    rsa_key = {
-                        'kty': key['kty'],
-                        'kid': key['kid'],
-                        'use': key['use'],
-                        'n': key['n'],
-                        'e': key['e']
-                    }
+            with AUTH_DURATION.labels('jwks').time():
+                rsa_key = jwks_store.get_key(unverified_header['kid'])
             if rsa_key:
                 try:
-                    payload = jwt.decode(
-                        token,
-                        rsa_key,
-                        algorithms=ALGORITHMS,
-                        audience=API_AUDIENCE,
-                        issuer=f'https://{AUTH0_DOMAIN}/'
-                    )
+                    with AUTH_DURATION.labels('decode').time():
+                        payload = jwt.decode(
+                            token,
+                            [rsa_key],
+                            algorithms=ALGORITHMS,
+                            audience=API_AUDIENCE,
+                            issuer=f'https://{AUTH0_DOMAIN}/'
+                        )
+                    if 'permissions' in payload:
+                        payload['permissions'] = frozenset(
+                            payload['permissions'])
+                    token_cache.set(token, payload)
                     return payload
                 except jwt.ExpiredSignatureError:
                     abort(401, description='Unauthorized: JWT Token expired')
@@ -80,13 +80,15 @@ class Auth:
         abort(401, description='Unauthorized: JWT unable to find kid key')
 
 
-def requires_auth(permission=''):
+def requires_auth(*permissions):
+    # All of the permissions are required, the token is decoded once.
     def requires_auth_decorator(f):
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = Auth.get_token_auth_header()
             payload = Auth.verify_decode_jwt(token)
-            if Auth.check_permissions(permission, payload):
+            if all(Auth.check_permissions(permission, payload)
+                   for permission in permissions):
                 _request_ctx_stack.top.current_user = payload
                 return f(*args, **kwargs)
         return wrapper
@@ -0,0 +1,162 @@
+import os
+import time
+import pickle
+import threading
+from collections import OrderedDict
+
+from src.models import change_listeners
+from src.metrics import CACHE_REQUESTS, CACHE_EVICTIONS
+
+
+class MemoryBackend:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                CACHE_EVICTIONS.labels('entities').inc()
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SharedBackend:
+    # Any Redis compatible client works, entries are then shared by every
+    # worker process instead of being cached per process.
+    def __init__(self, client, prefix='casting-agency:'):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return pickle.loads(value) if value is not None else None
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value),
+                        ex=max(1, int(ttl)))
+
+    def delete(self, keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + '*'))
+        if keys:
+            self.client.delete(*keys)
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, ttl):
+        pass
+
+    def delete(self, keys):
+        pass
+
+    def clear(self):
+        pass
+
+
+def create_backend():
+    backend = os.environ.get('ENTITY_CACHE_BACKEND', 'memory')
+    if backend == 'memory':
+        return MemoryBackend(int(os.environ.get('ENTITY_CACHE_SIZE', 1024)))
+    if backend == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('ENTITY_CACHE_BACKEND=redis requires the '
+                               'redis package')
+        return SharedBackend(redis.Redis.from_url(
+            os.environ.get('ENTITY_CACHE_URL', 'redis://localhost:6379/0')))
+    if backend == 'none':
+        return NullBackend()
+    raise ValueError(f'Unknown entity cache backend: {backend}')
+
+
+class EntityCache:
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or NullBackend()
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, backend, ttl=None):
+        self.backend = backend
+        if ttl is not None:
+            self.ttl = ttl
+        with self._lock:
+            self.hits = self.misses = 0
+
+    @staticmethod
+    def key(table, row_id):
+        return f'{table}:{row_id}'
+
+    def get_or_load(self, table, row_id, load, versions=None, store=True):
+        # Entries carry the table versions they were loaded at, so a write
+        # committed by another process (which only evicts its own cache)
+        # still turns this process's entry into a miss.
+        key = self.key(table, row_id)
+        entry = self.backend.get(key)
+        with self._lock:
+            if entry is not None and entry[0] == versions:
+                self.hits += 1
+                CACHE_REQUESTS.labels('entities', 'hit').inc()
+                return entry[1]
+            self.misses += 1
+        CACHE_REQUESTS.labels('entities', 'miss').inc()
+        value = load()
+        if value is not None and store:
+            self.backend.set(key, (versions, value), self.ttl)
+        return value
+
+    def invalidate(self, changes):
+        self.backend.delete([self.key(table, row_id)
+                             for table, ids in changes.items()
+                             for row_id in ids])
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'backend': type(self.backend).__name__,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / requests if requests else 0.0
+            }
+
+
+entity_cache = EntityCache()
+change_listeners.append(entity_cache.invalidate)
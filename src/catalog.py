@@ -0,0 +1,347 @@
+import os
+import io
+import csv
+import sys
+import json
+import time
+from contextlib import nullcontext
+from datetime import date
+from itertools import islice
+
+import click
+from dateutil.parser import isoparse
+from flask.cli import AppGroup
+from sqlalchemy import select, text
+
+from src.models import (
+    db, Actor, Gender, Movie, TableVersion, record_change)
+from src.serialization import dumps
+
+
+cli = AppGroup('catalog', help='Bulk import and export of actors, movies '
+                               'and casts.')
+
+# Columns in file order; an id column is optional on import.
+COLUMNS = {
+    'actors': ('id', 'name', 'age', 'gender'),
+    'movies': ('id', 'title', 'release_date'),
+    'movie_actors': ('movie_id', 'actor_id')
+}
+MODELS = {'actors': Actor, 'movies': Movie}
+FORMATS = ('csv', 'ndjson')
+OPTIONAL_COLUMNS = ('id',)
+# Postgres COPY expressions rendering values the way file_value does.
+COPY_EXPRESSIONS = {
+    'gender': 'lower(gender::text)',
+    'release_date': "to_json(release_date) #>> '{}'"
+}
+# Keeps IN lists below SQLite's bound parameter limit.
+KEY_BATCH = 500
+
+
+def parse_int(value):
+    if isinstance(value, (bool, float)):
+        raise ValueError(f'expected an integer, got {value!r}')
+    return int(value)
+
+
+def parse_gender(value):
+    try:
+        return Gender[str(value).upper()]
+    except KeyError:
+        raise ValueError(f'unknown gender {value!r}')
+
+
+def parse_text(value):
+    if not isinstance(value, str) or not value:
+        raise ValueError(f'expected a non empty string, got {value!r}')
+    return value
+
+
+PARSERS = {
+    'id': parse_int,
+    'name': parse_text,
+    'age': parse_int,
+    'gender': parse_gender,
+    'title': parse_text,
+    'release_date': isoparse,
+    'movie_id': parse_int,
+    'actor_id': parse_int
+}
+
+
+def file_value(value):
+    if isinstance(value, Gender):
+        return value.name.lower()
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def copy_value(value):
+    if isinstance(value, Gender):
+        return value.name
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def guess_format(path):
+    return 'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def open_file(path, mode):
+    if path == '-':
+        return nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    return open(path, mode, newline='', encoding='utf-8')
+
+
+def dialect_name():
+    return db.session.get_bind().dialect.name
+
+
+def chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_rows(f, file_format):
+    if file_format == 'csv':
+        reader = csv.DictReader(f)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            raise click.ClickException(f'line {line_number}: {e}')
+        if not isinstance(row, dict):
+            raise click.ClickException(
+                f'line {line_number}: expected a JSON object')
+        yield line_number, row
+
+
+def parse_row(line_number, raw, columns):
+    if set(raw) != set(columns):
+        raise click.ClickException(
+            f'line {line_number}: expected the columns '
+            f"{', '.join(columns)}, got {', '.join(raw)}")
+    try:
+        return {column: PARSERS[column](raw[column]) for column in columns}
+    except (TypeError, ValueError) as e:
+        raise click.ClickException(f'line {line_number}: {e}')
+
+
+def file_columns(table, line_number, raw):
+    columns = tuple(column for column in COLUMNS[table] if column in raw)
+    missing = [column for column in COLUMNS[table]
+               if column not in raw and column not in OPTIONAL_COLUMNS]
+    if missing:
+        raise click.ClickException(
+            f"line {line_number}: missing columns {', '.join(missing)}")
+    return columns
+
+
+def load_checkpoint(path, table):
+    if not path or not os.path.exists(path):
+        return 0, 0
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint['table'] != table:
+        raise click.ClickException(
+            f"{path} is a checkpoint for {checkpoint['table']}, pass "
+            '--restart to import from the first row')
+    return checkpoint['rows'], checkpoint['chunk_size']
+
+
+def save_checkpoint(path, table, rows, chunk_size):
+    if not path:
+        return
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump({'table': table, 'rows': rows, 'chunk_size': chunk_size},
+                  f)
+    os.replace(f'{path}.tmp', path)
+
+
+def skip_existing(table, rows):
+    # Rows committed after the last checkpoint was written are imported
+    # again on resume, drop the ones whose key is already present.
+    keys = [column.name for column in table.primary_key.columns]
+    if not rows or any(key not in rows[0] for key in keys):
+        return rows
+    first = table.c[keys[0]]
+    existing = set()
+    values = sorted(set(row[keys[0]] for row in rows))
+    for start in range(0, len(values), KEY_BATCH):
+        existing.update(tuple(found) for found in db.session.execute(
+            select([table.c[key] for key in keys]).where(
+                first.in_(values[start:start + KEY_BATCH]))))
+    return [row for row in rows
+            if tuple(row[key] for key in keys) not in existing]
+
+
+def copy_in(table, columns, rows):
+    buffer = io.StringIO()
+    # Strings are quoted so an unquoted empty field can only mean NULL.
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([copy_value(row[column]) for column in columns])
+    buffer.seek(0)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) "
+                       'FROM STDIN WITH (FORMAT csv)', buffer)
+
+
+def write_chunk(table, columns, rows):
+    if dialect_name() == 'postgresql':
+        copy_in(table, columns, rows)
+    else:
+        db.session.execute(table.insert(), rows)
+    TableVersion.bump(table.name)
+    if table.name in MODELS:
+        MODELS[table.name].count_rows(rows)
+    if table.name == 'movie_actors':
+        record_change('movies', [row['movie_id'] for row in rows])
+        record_change('actors', [row['actor_id'] for row in rows])
+    elif 'id' in columns:
+        record_change(table.name, [row['id'] for row in rows])
+    db.session.commit()
+
+
+def reset_sequence(table):
+    # Imported ids bypass the sequence, move it past them so inserts
+    # through the API do not collide.
+    if dialect_name() == 'postgresql' and 'id' in table.c:
+        db.session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            'GREATEST(MAX(id), 1), MAX(id) IS NOT NULL) '
+            f'FROM {table.name}'))
+        db.session.commit()
+
+
+class Progress:
+    def __init__(self, label, start=0):
+        self.label = label
+        self.start = start
+        self.started = time.perf_counter()
+
+    def report(self, rows, done=False):
+        elapsed = time.perf_counter() - self.started
+        rate = (rows - self.start) / elapsed if elapsed else 0
+        click.echo(f"{self.label}: {rows} rows{' done' if done else ''} "
+                   f'({rate:.0f} rows/s)', err=True)
+
+
+@cli.command('import')
+@click.argument('table', type=click.Choice(list(COLUMNS)))
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True))
+@click.option('--format', 'file_format', type=click.Choice(FORMATS),
+              help='Defaults to ndjson for .ndjson and .jsonl files, csv '
+                   'otherwise.')
+@click.option('--chunk-size', type=click.IntRange(1), default=10000,
+              show_default=True, help='Rows written per transaction.')
+@click.option('--checkpoint', type=click.Path(dir_okay=False),
+              help='Progress file for resuming, defaults to '
+                   'PATH.checkpoint (none when reading stdin).')
+@click.option('--restart', is_flag=True,
+              help='Ignore an existing checkpoint.')
+def import_command(table, path, file_format, chunk_size, checkpoint,
+                   restart):
+    """Import TABLE rows from a CSV or NDJSON file ('-' for stdin).
+
+    Every chunk is committed with the number of rows done recorded in the
+    checkpoint, so a killed import continues after the last committed
+    chunk when run again. Imports without an id column can only be
+    resumed safely if the last chunk did not commit.
+    """
+    file_format = file_format or guess_format(path)
+    if checkpoint is None and path != '-':
+        checkpoint = f'{path}.checkpoint'
+    done, last_chunk_size = (0, 0) if restart else load_checkpoint(
+        checkpoint, table)
+    recheck_until = done + last_chunk_size
+    if done:
+        click.echo(f'{table}: resuming after row {done}', err=True)
+    target = db.metadata.tables[table]
+    progress = Progress(table, done)
+    with open_file(path, 'r') as f:
+        rows = read_rows(f, file_format)
+        for _ in islice(rows, done):
+            pass
+        columns = None
+        for chunk in chunks(rows, chunk_size):
+            if columns is None:
+                columns = file_columns(table, *chunk[0])
+            parsed = [parse_row(line_number, raw, columns)
+                      for line_number, raw in chunk]
+            if done < recheck_until:
+                parsed = skip_existing(target, parsed)
+            if parsed:
+                write_chunk(target, columns, parsed)
+            done += len(chunk)
+            save_checkpoint(checkpoint, table, done, chunk_size)
+            progress.report(done)
+    reset_sequence(target)
+    if checkpoint and os.path.exists(checkpoint):
+        os.remove(checkpoint)
+    progress.report(done, done=True)
+
+
+def copy_out(table, columns, f):
+    expressions = ', '.join(
+        f'{COPY_EXPRESSIONS[column]} AS {column}'
+        if column in COPY_EXPRESSIONS else column for column in columns)
+    keys = ', '.join(column.name for column in table.primary_key.columns)
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        f'COPY (SELECT {expressions} FROM {table.name} ORDER BY {keys}) '
+        'TO STDOUT WITH (FORMAT csv, HEADER)', f)
+    return cursor.rowcount
+
+
+@cli.command('export')
+@click.argument('table', type=click.Choice(list(COLUMNS)))
+@click.argument('path', type=click.Path(dir_okay=False, allow_dash=True),
+                default='-')
+@click.option('--format', 'file_format', type=click.Choice(FORMATS),
+              help='Defaults to ndjson for .ndjson and .jsonl files, csv '
+                   'otherwise.')
+@click.option('--chunk-size', type=click.IntRange(1), default=10000,
+              show_default=True, help='Rows fetched at a time.')
+def export_command(table, path, file_format, chunk_size):
+    """Export TABLE rows ordered by key to a CSV or NDJSON file (stdout by
+    default)."""
+    file_format = file_format or guess_format(path)
+    target = db.metadata.tables[table]
+    columns = COLUMNS[table]
+    progress = Progress(table)
+    with open_file(path, 'w') as f:
+        if file_format == 'csv' and dialect_name() == 'postgresql':
+            progress.report(copy_out(target, columns, f), done=True)
+            return
+        result = db.session.connection(
+            execution_options={'stream_results': True}).execute(
+            select([target.c[column] for column in columns]).order_by(
+                *target.primary_key.columns))
+        writer = csv.writer(f)
+        if file_format == 'csv':
+            writer.writerow(columns)
+        done = 0
+        for rows in iter(lambda: result.fetchmany(chunk_size), []):
+            for row in rows:
+                values = [file_value(value) for value in row]
+                if file_format == 'csv':
+                    writer.writerow(values)
+                else:
+                    f.write(dumps(dict(zip(columns, values))).decode()
+                            + '\n')
+            done += len(rows)
+            progress.report(done)
+        progress.report(done, done=True)
@@ -0,0 +1,210 @@
+import threading
+from array import array
+
+from flask import current_app
+from sqlalchemy import Integer, String, bindparam, event, select
+
+from src.models import (
+    db, Actor, Movie, CastChange, TableVersion, linked_ids,
+    movie_actors_table)
+
+
+# Rebuild the arrays instead of patching once this many nodes have been
+# reloaded since the last build. Commits changing more nodes are not
+# logged, the version gap they leave triggers the rebuild.
+COMPACT_AFTER = 10000
+# Keeps IN lists below SQLite's bound parameter limit.
+RELOAD_BATCH = 500
+# Versions kept in the change log, a graph further behind is rebuilt.
+CHANGE_LOG_VERSIONS = 1000
+
+
+def build_csr(pairs):
+    # Compressed sparse rows: the neighbours of node n are
+    # links[offsets[n]:offsets[n + 1]], pairs must be sorted by node.
+    offsets = array('i', [0])
+    links = array('i')
+    for node, neighbour in pairs:
+        while len(offsets) <= node:
+            offsets.append(len(links))
+        links.append(neighbour)
+    offsets.append(len(links))
+    return offsets, links
+
+
+class Adjacency:
+    def __init__(self, key_column, value_column):
+        self.key_column = key_column
+        self.value_column = value_column
+        self.offsets, self.links = build_csr(
+            db.session.query(key_column, value_column).order_by(
+                key_column, value_column))
+        self.patched = {}
+
+    def neighbours(self, node):
+        if node in self.patched:
+            return self.patched[node]
+        if node + 1 >= len(self.offsets):
+            return ()
+        return self.links[self.offsets[node]:self.offsets[node + 1]]
+
+    def reload(self, nodes):
+        nodes = sorted(nodes)
+        for start in range(0, len(nodes), RELOAD_BATCH):
+            batch = nodes[start:start + RELOAD_BATCH]
+            ids = linked_ids(self.key_column, self.value_column, batch)
+            for node in batch:
+                self.patched[node] = array('i', ids.get(node, ()))
+
+
+class CastGraph:
+    """Actor-movie adjacency index for degrees of separation queries.
+
+    Every commit that changes casts logs the changed actors and movies
+    under its movie_actors version, whichever process made it, and the
+    next query reloads just those nodes. A gap in the log (writes that
+    bypassed it, or a graph too far behind) triggers a full rebuild.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.version = None
+        self.actors = self.movies = None
+
+    def build(self, version):
+        self.actors = Adjacency(movie_actors_table.c.actor_id,
+                                movie_actors_table.c.movie_id)
+        self.movies = Adjacency(movie_actors_table.c.movie_id,
+                                movie_actors_table.c.actor_id)
+        self.version = version
+
+    def changes_since(self, version):
+        # Returns the changed actors and movies up to the current version,
+        # or None if the log does not cover every version in between.
+        current = TableVersion.current(
+            movie_actors_table.name)[movie_actors_table.name]
+        if current < version:
+            return current, None
+        changed = {Actor.__tablename__: set(), Movie.__tablename__: set()}
+        versions = set()
+        for row in db.session.query(
+                CastChange.version, CastChange.table_name,
+                CastChange.row_id).filter(CastChange.version > version,
+                                          CastChange.version <= current):
+            versions.add(row.version)
+            changed[row.table_name].add(row.row_id)
+        if versions != set(range(version + 1, current + 1)):
+            return current, None
+        return current, changed
+
+    def refresh(self):
+        with self._lock:
+            if self.version is None:
+                self.build(TableVersion.current(
+                    movie_actors_table.name)[movie_actors_table.name])
+                return self.actors, self.movies
+            version, changed = self.changes_since(self.version)
+            if changed is None or (
+                    len(self.actors.patched) + len(self.movies.patched)
+                    + sum(map(len, changed.values())) > COMPACT_AFTER):
+                self.build(version)
+            else:
+                self.actors.reload(changed[Actor.__tablename__])
+                self.movies.reload(changed[Movie.__tablename__])
+                self.version = version
+            return self.actors, self.movies
+
+    def shortest_path(self, source, target):
+        actors, movies = self.refresh()
+        if source == target:
+            return [source], []
+        # parents[side][actor] = (previous actor, movie linking them)
+        parents = ({source: None}, {target: None})
+        frontiers = [[source], [target]]
+        while frontiers[0] and frontiers[1]:
+            # Expand the smaller side one actor-movie-actor level.
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            seen, other = parents[side], parents[1 - side]
+            next_frontier = []
+            meetings = []
+            for actor in frontiers[side]:
+                for movie in actors.neighbours(actor):
+                    for costar in movies.neighbours(movie):
+                        if costar in seen:
+                            continue
+                        seen[costar] = (actor, movie)
+                        if costar in other:
+                            meetings.append(costar)
+                        next_frontier.append(costar)
+            if meetings:
+                # Meetings on the same level can still differ in length
+                # on the other side, keep the shortest.
+                return min((self.join(parents, meeting)
+                            for meeting in meetings),
+                           key=lambda path: len(path[1]))
+            frontiers[side] = next_frontier
+        return None
+
+    @staticmethod
+    def join(parents, meeting):
+        # Walk back from the meeting actor to both ends.
+        halves = []
+        for parent in parents:
+            actors, movies = [meeting], []
+            link = parent[meeting]
+            while link is not None:
+                actor, movie = link
+                actors.append(actor)
+                movies.append(movie)
+                link = parent[actor]
+            halves.append((actors, movies))
+        (source_actors, source_movies), (target_actors, target_movies) = \
+            halves
+        return (source_actors[::-1] + target_actors[1:],
+                source_movies[::-1] + target_movies)
+
+
+def cast_graph():
+    return current_app.extensions['cast_graph']
+
+
+def init_graph(app):
+    app.extensions['cast_graph'] = CastGraph()
+
+
+@event.listens_for(db.session, 'before_commit', insert=True)
+def collect_cast_changes(session):
+    # Runs before the table versions are written, which consumes the set
+    # of bumped tables.
+    if movie_actors_table.name in session.info.get('bumped_tables', ()):
+        changes = session.info.get('changes', {})
+        session.info['cast_changes'] = [
+            {'table_name': table, 'row_id': row_id}
+            for table in (Actor.__tablename__, Movie.__tablename__)
+            for row_id in sorted(changes.get(table, ()))]
+
+
+@event.listens_for(db.session, 'before_commit')
+def log_cast_changes(session):
+    # Runs after the version bump, the rows read the version this commit
+    # writes.
+    rows = session.info.pop('cast_changes', None)
+    if rows is None:
+        return
+    version = select([TableVersion.version]).where(
+        TableVersion.table_name == movie_actors_table.name)
+    table = CastChange.__table__
+    if 0 < len(rows) <= COMPACT_AFTER:
+        session.execute(table.insert().from_select(
+            ['version', 'table_name', 'row_id'],
+            version.with_only_columns([
+                TableVersion.version,
+                bindparam('table_name', type_=String),
+                bindparam('row_id', type_=Integer)])), rows)
+    session.execute(table.delete().where(
+        table.c.version <= version.as_scalar() - CHANGE_LOG_VERSIONS))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_cast_changes(session):
+    session.info.pop('cast_changes', None)
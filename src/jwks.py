@@ -0,0 +1,136 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlparse
+from urllib.request import urlopen
+
+from src.jwt_backend import current_backend, prepare_key
+
+
+class JWKSError(Exception):
+    pass
+
+
+class JWKSKeyStore:
+    def __init__(self, ttl=None, min_refresh_interval=None, timeout=None):
+        self._ttl = ttl
+        self._min_refresh_interval = min_refresh_interval
+        self._timeout = timeout
+        self._lock = threading.Lock()
+        self._keys = {}
+        self._identity_key = None
+        self._fetched_at = None
+        self._attempted_at = None
+
+    @property
+    def ttl(self):
+        if self._ttl is not None:
+            return self._ttl
+        return float(os.environ.get('JWKS_CACHE_TTL', 600))
+
+    @property
+    def min_refresh_interval(self):
+        if self._min_refresh_interval is not None:
+            return self._min_refresh_interval
+        return float(os.environ.get('JWKS_MIN_REFRESH_INTERVAL', 30))
+
+    @property
+    def timeout(self):
+        if self._timeout is not None:
+            return self._timeout
+        return float(os.environ.get('JWKS_FETCH_TIMEOUT', 5))
+
+    @staticmethod
+    def source():
+        override = os.environ.get('AUTH0_JWKS_URL')
+        if override:
+            return override
+        domain = os.environ.get('AUTH0_DOMAIN')
+        return f'https://{domain}/.well-known/jwks.json'
+
+    def get_key(self, kid):
+        keys, stale = self._snapshot(self._identity())
+        if kid in keys and not stale:
+            return keys[kid]
+        keys = self.refresh(force=kid not in keys)
+        return keys.get(kid)
+
+    def refresh(self, force=True):
+        identity = self._identity()
+        source = identity[0]
+        started = time.monotonic()
+        with self._lock:
+            if self._identity_key != identity:
+                self._reset(identity)
+            error = None
+            if self._should_fetch(started, force):
+                self._attempted_at = time.monotonic()
+                try:
+                    self._keys = self._load(source)
+                    self._fetched_at = self._attempted_at
+                except Exception as e:
+                    error = e
+            if not self._keys:
+                raise JWKSError(f'Unable to fetch JWKS from {source}') \
+                    from error
+            return self._keys
+
+    def clear(self):
+        with self._lock:
+            self._reset(None)
+
+    def _identity(self):
+        # Keys are prepared for a specific crypto backend, so switching
+        # backends invalidates them just like switching JWKS sources.
+        return self.source(), current_backend()
+
+    def _snapshot(self, identity):
+        if self._identity_key != identity:
+            return {}, True
+        return self._keys, self._is_stale(time.monotonic())
+
+    def _should_fetch(self, started, force):
+        if self._attempted_at is None:
+            return True
+        # Another thread fetched while we waited on the lock, or a fetch
+        # was attempted very recently: serve what we have (possibly stale)
+        # rather than hammering the identity provider.
+        if self._attempted_at >= started:
+            return False
+        if started - self._attempted_at < self.min_refresh_interval:
+            return False
+        return force or self._is_stale(started)
+
+    def _is_stale(self, now):
+        return self._fetched_at is None or now - self._fetched_at > self.ttl
+
+    def _reset(self, identity):
+        self._keys = {}
+        self._identity_key = identity
+        self._fetched_at = None
+        self._attempted_at = None
+
+    def _load(self, source):
+        if urlparse(source).scheme in ('http', 'https', 'file'):
+            with urlopen(source, timeout=self.timeout) as response:
+                jwks = json.loads(response.read())
+        else:
+            with open(source) as f:
+                jwks = json.load(f)
+        return {key['kid']: self.parse_key(key) for key in jwks['keys']}
+
+    @staticmethod
+    def parse_key(key):
+        # Public key objects are built once per JWKS key instead of from
+        # the n/e members on every verification.
+        return prepare_key({
+            'kty': key['kty'],
+            'kid': key['kid'],
+            'use': key['use'],
+            'n': key['n'],
+            'e': key['e']
+        }, key.get('alg', 'RS256'))
+
+
+jwks_store = JWKSKeyStore()
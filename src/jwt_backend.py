@@ -0,0 +1,66 @@
+import os
+
+from jose import jwk
+from jose.constants import ALGORITHMS
+
+
+def _cryptography_key_class():
+    from jose.backends.cryptography_backend import CryptographyRSAKey
+    return CryptographyRSAKey
+
+
+def _rsa_key_class():
+    from jose.backends.rsa_backend import RSAKey
+    return RSAKey
+
+
+BACKENDS = {
+    'cryptography': _cryptography_key_class,
+    'rsa': _rsa_key_class
+}
+PREFERRED_BACKENDS = ('cryptography', 'rsa')
+
+_selected = None
+
+
+def available_backends():
+    names = []
+    for name in PREFERRED_BACKENDS:
+        try:
+            BACKENDS[name]()
+            names.append(name)
+        except ImportError:
+            pass
+    return names
+
+
+def select_backend(name=None):
+    global _selected
+    name = name or os.environ.get('JWT_CRYPTO_BACKEND', 'auto')
+    if name == 'auto':
+        name = available_backends()[0]
+    if name not in BACKENDS:
+        raise ValueError(f'Unknown JWT crypto backend: {name}')
+    key_class = BACKENDS[name]()
+    # Registering the key class makes jose verify with the same backend
+    # that built the prepared public keys.
+    for algorithm in ALGORITHMS.RSA:
+        jwk.register_key(algorithm, key_class)
+    _selected = (name, key_class)
+    return name
+
+
+def current_backend():
+    if _selected is None:
+        select_backend()
+    return _selected[0]
+
+
+def prepare_key(key, algorithm=ALGORITHMS.RS256):
+    if _selected is None:
+        select_backend()
+    name, key_class = _selected
+    prepared = key_class(key, algorithm)
+    if name == 'cryptography':
+        return prepared.prepared_key
+    return prepared._prepared_key
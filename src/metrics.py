@@ -0,0 +1,159 @@
+import os
+import time
+import logging
+
+from flask import (
+    Blueprint, Response, current_app, g, request, has_request_context)
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge,
+    Histogram, generate_latest, multiprocess)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+REQUESTS = Counter(
+    'http_requests_total', 'HTTP requests by route and status code',
+    ['blueprint', 'endpoint', 'method', 'status'])
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route',
+    ['blueprint', 'endpoint', 'method'])
+AUTH_DURATION = Histogram(
+    'auth_duration_seconds', 'Access token verification time by stage '
+    '(jwks: signing key lookup and fetch, decode: signature and claims)',
+    ['stage'])
+DB_DURATION = Histogram(
+    'db_query_duration_seconds', 'Database statement time by route',
+    ['blueprint', 'endpoint'])
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Cache lookups by cache and result (hit, miss)',
+    ['cache', 'result'])
+CACHE_EVICTIONS = Counter(
+    'cache_evictions_total', 'Entries evicted to stay within the size limit',
+    ['cache'])
+# Connection pool usage by database (host/name). With several gunicorn
+# workers the counters and the livesum gauges add up every worker's pool,
+# which is what max_connections on the server has to cover.
+DB_POOL_CHECKOUTS = Counter(
+    'db_pool_checkouts_total', 'Connection pool checkouts', ['database'])
+DB_POOL_TIMEOUTS = Counter(
+    'db_pool_timeouts_total', 'Connection pool checkouts that timed out',
+    ['database'])
+DB_POOL_WAIT = Histogram(
+    'db_pool_wait_seconds', 'Time spent waiting for a pooled connection',
+    ['database'])
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Pooled connections in use', ['database'],
+    multiprocess_mode='livesum')
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Overflow connections open beyond the pool size',
+    ['database'], multiprocess_mode='livesum')
+
+bp = Blueprint('metrics', __name__)
+logger = logging.getLogger(__name__)
+
+
+class SQLStats:
+    __slots__ = ('count', 'total', 'slowest', 'slowest_statement')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.slowest_statement = None
+
+    def add(self, statement, elapsed):
+        self.count += 1
+        self.total += elapsed
+        if elapsed >= self.slowest:
+            self.slowest = elapsed
+            self.slowest_statement = statement
+
+    def log_fields(self):
+        return {
+            'db_queries': self.count,
+            'db_time_ms': round(self.total * 1000, 3),
+            'db_slowest_ms': round(self.slowest * 1000, 3),
+            'db_slowest_statement': self.slowest_statement
+        }
+
+    def server_timing(self):
+        return (f'db;dur={self.total * 1000:.3f};'
+                f'desc="{self.count} queries", '
+                f'db-slowest;dur={self.slowest * 1000:.3f}')
+
+
+def route_labels():
+    return request.blueprint or '', request.endpoint or 'unmatched'
+
+
+def start_timer():
+    g.request_started = time.perf_counter()
+    g.sql_stats = SQLStats()
+
+
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is None:
+        return response
+    elapsed = time.perf_counter() - started
+    blueprint, endpoint = route_labels()
+    REQUESTS.labels(blueprint, endpoint, request.method,
+                    response.status_code).inc()
+    REQUEST_DURATION.labels(blueprint, endpoint, request.method).observe(
+        elapsed)
+    stats = g.sql_stats
+    fields = dict(method=request.method,
+                  path=request.full_path.rstrip('?'),
+                  status=response.status_code,
+                  duration_ms=round(elapsed * 1000, 3),
+                  **stats.log_fields())
+    logger.info(' '.join(f'{key}={value}' for key, value in fields.items()
+                         if key != 'db_slowest_statement'), extra=fields)
+    if current_app.debug:
+        response.headers.add('Server-Timing', stats.server_timing())
+    return response
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context,
+                      executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    if has_request_context():
+        DB_DURATION.labels(*route_labels()).observe(elapsed)
+        stats = g.get('sql_stats')
+        if stats is not None:
+            stats.add(statement, elapsed)
+
+
+@event.listens_for(Engine, 'handle_error')
+def discard_query_timer(context):
+    if context.connection is not None:
+        started = context.connection.info.get('query_started')
+        if started:
+            started.pop()
+
+
+def collect():
+    if 'prometheus_multiproc_dir' in os.environ:
+        # Every gunicorn worker writes its samples to this directory, the
+        # worker serving the scrape aggregates all of them.
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+@bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(collect(), content_type=CONTENT_TYPE_LATEST)
+
+
+def init_metrics(app):
+    app.before_request(start_timer)
+    app.after_request(record_request)
+    app.register_blueprint(bp)
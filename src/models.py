@@ -1,9 +1,15 @@
+import re
 import enum
+from collections import Counter
 
-from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import (
+    DDL, and_, or_, case, event, inspect, func, select)
+from sqlalchemy.dialects import postgresql
 
+from src.replicas import RoutingSQLAlchemy
 
-db = SQLAlchemy()
+
+db = RoutingSQLAlchemy()
 
 
 class Gender(enum.Enum):
@@ -17,31 +23,346 @@ movie_actors_table = db.Table(
               db.ForeignKey('movies.id'), primary_key=True),
     db.Column('actor_id', db.Integer,
               db.ForeignKey('actors.id'), primary_key=True),
+    db.Index('ix_movie_actors_actor_id_movie_id', 'actor_id', 'movie_id'),
 )
 
 
+class TableVersion(db.Model):
+    __tablename__ = 'table_versions'
+    TABLES = ('actors', 'movies', 'movie_actors')
+    table_name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def bump(cls, *tables):
+        # Bumps are collected and written with a single UPDATE when the
+        # transaction commits, however many writes it contains.
+        db.session.info.setdefault('bumped_tables', set()).update(tables)
+
+    @classmethod
+    def current(cls, *tables):
+        rows = db.session.query(cls.table_name, cls.version).filter(
+            cls.table_name.in_(tables))
+        return dict(rows)
+
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def seed_table_versions(target, connection, **kw):
+    connection.execute(target.insert(), [
+        {'table_name': table, 'version': 0} for table in TableVersion.TABLES])
+
+
+class StatCounter(db.Model):
+    # Precomputed GROUP BY counts, e.g. ('actors_by_gender', 'female').
+    __tablename__ = 'stat_counters'
+    name = db.Column(db.String, primary_key=True)
+    key = db.Column(db.String, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    @classmethod
+    def add(cls, deltas):
+        # Like table version bumps, deltas are summed and written when the
+        # transaction commits.
+        db.session.info.setdefault('stat_deltas', Counter()).update(deltas)
+
+    @classmethod
+    def current(cls, name):
+        return dict(db.session.query(cls.key, cls.count).filter(
+            cls.name == name, cls.count != 0))
+
+
+class CastChange(db.Model):
+    # Actors and movies whose casts changed, by the movie_actors version
+    # of the commit, so every process can patch its cast graph.
+    __tablename__ = 'cast_changes'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, index=True)
+    table_name = db.Column(db.String, nullable=False)
+    row_id = db.Column(db.Integer, nullable=False)
+
+
+@event.listens_for(db.session, 'before_commit')
+def apply_stat_deltas(session):
+    # Commit flushes after before_commit, flush now so the deltas of
+    # pending ORM writes are included.
+    session.flush()
+    deltas = session.info.pop('stat_deltas', None)
+    rows = [{'name': name, 'key': key, 'count': delta}
+            for (name, key), delta in sorted((deltas or {}).items())
+            if delta]
+    if not rows:
+        return
+    table = StatCounter.__table__
+    if session.get_bind().dialect.name == 'postgresql':
+        statement = postgresql.insert(table).values(rows)
+        session.execute(statement.on_conflict_do_update(
+            index_elements=[table.c.name, table.c.key],
+            set_={'count': table.c.count + statement.excluded.count}))
+        return
+    # SQLite holds the database write lock here, so no other writer can
+    # insert the same counter between the select and the insert.
+    existing = set(tuple(row) for row in session.execute(
+        select([table.c.name, table.c.key]).where(table.c.name.in_(
+            sorted(set(row['name'] for row in rows))))))
+    matches = [((table.c.name == row['name']) & (table.c.key == row['key']),
+                row['count'])
+               for row in rows if (row['name'], row['key']) in existing]
+    if matches:
+        session.execute(table.update().where(or_(
+            *[match for match, _ in matches])).values(
+            count=table.c.count + case(matches, else_=0)))
+    missing = [row for row in rows
+               if (row['name'], row['key']) not in existing]
+    if missing:
+        session.execute(table.insert(), missing)
+
+
+@event.listens_for(db.session, 'before_flush')
+def count_flushed_rows(session, flush_context, instances):
+    # ORM writes are counted from the attribute history at flush time,
+    # which also covers autoflushes in the middle of an update.
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, CrudModel):
+            instance.count_changes()
+    for instance in session.deleted:
+        if isinstance(instance, CrudModel):
+            instance.count_changes(deleted=True)
+
+
+def count_stats(connection, models):
+    # Recomputes the counters of models from scratch, one GROUP BY each.
+    counts = Counter()
+    for model in models:
+        for name, (column, key) in model.STAT_COUNTERS.items():
+            column = model.__table__.c[column]
+            for value, count in connection.execute(
+                    select([column, func.count()]).group_by(column)):
+                counts[(name, key(value))] += count
+    return counts
+
+
+change_listeners = []
+
+
+def record_change(table, ids):
+    changes = db.session.info.setdefault('changes', {})
+    changes.setdefault(table, set()).update(ids)
+
+
+@event.listens_for(db.session, 'after_commit')
+def notify_changes(session):
+    changes = session.info.pop('changes', None)
+    if changes:
+        for listener in change_listeners:
+            listener(changes)
+
+
+@event.listens_for(db.session, 'before_commit')
+def bump_table_versions(session):
+    tables = session.info.pop('bumped_tables', None)
+    if tables:
+        session.query(TableVersion).filter(
+            TableVersion.table_name.in_(sorted(tables))).update(
+            {TableVersion.version: TableVersion.version + 1},
+            synchronize_session=False)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_changes(session):
+    session.info.pop('changes', None)
+    session.info.pop('bumped_tables', None)
+    session.info.pop('stat_deltas', None)
+
+
+def linked_ids(key_column, value_column, keys=None):
+    query = db.session.query(key_column, value_column)
+    if keys is not None:
+        if not keys:
+            return {}
+        query = query.filter(key_column.in_(keys))
+    ids = {}
+    for key, value in query.order_by(key_column, value_column):
+        ids.setdefault(key, []).append(value)
+    return ids
+
+
 class CrudModel(db.Model):
     __abstract__ = True
+    FIELDS = ()
+    LINK_FIELD = None
+    LINK_COLUMNS = None
+    # StatCounter name -> (column, function turning a value into its key)
+    STAT_COUNTERS = {}
 
     def insert(self):
         db.session.add(self)
+        self.record_changes()
         db.session.commit()
         return self
 
     def update(self):
+        self.record_changes()
         db.session.commit()
         return self
 
     def delete(self):
+        key_column, value_column = (
+            movie_actors_table.c[name] for name in self.LINK_COLUMNS)
+        record_change(self.__tablename__, [self.id])
+        record_change(self.linked_model().__tablename__, [
+            linked_id for (linked_id,) in db.session.query(
+                value_column).filter(key_column == self.id)])
         db.session.delete(self)
+        TableVersion.bump(self.__tablename__, movie_actors_table.name)
         db.session.commit()
 
+    def record_changes(self):
+        history = inspect(self).attrs[self.LINK_FIELD].history
+        linked = list(history.added or ()) + list(history.deleted or ())
+        if linked:
+            TableVersion.bump(self.__tablename__, movie_actors_table.name)
+        else:
+            TableVersion.bump(self.__tablename__)
+        db.session.flush()
+        record_change(self.__tablename__, [self.id])
+        record_change(self.linked_model().__tablename__,
+                      [linked_object.id for linked_object in linked])
+
+    def count_changes(self, deleted=False):
+        deltas = Counter()
+        state = inspect(self)
+        for name, (column, key) in self.STAT_COUNTERS.items():
+            history = state.attrs[column].history
+            if deleted:
+                for value in history.unchanged or history.deleted:
+                    deltas[(name, key(value))] -= 1
+                continue
+            for value in history.added or ():
+                deltas[(name, key(value))] += 1
+            for value in history.deleted or ():
+                deltas[(name, key(value))] -= 1
+        StatCounter.add(deltas)
+
+    @classmethod
+    def count_rows(cls, rows, sign=1):
+        deltas = Counter()
+        for name, (column, key) in cls.STAT_COUNTERS.items():
+            for row in rows:
+                deltas[(name, key(row[column]))] += sign
+        StatCounter.add(deltas)
+
+    @classmethod
+    def linked_model(cls):
+        return cls.__mapper__.relationships[cls.LINK_FIELD].mapper.class_
+
+    @classmethod
+    def bulk_insert(cls, rows, links):
+        table = cls.__table__
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Reserve the ids up front so rows and links can both be
+            # written with a single executemany each.
+            ids = [row_id for (row_id,) in db.session.execute(
+                select([func.nextval(f'{table.name}_id_seq')]).select_from(
+                    func.generate_series(1, len(rows))))]
+            db.session.execute(table.insert(), [
+                dict(row, id=row_id) for row, row_id in zip(rows, ids)])
+        else:
+            ids = [db.session.execute(table.insert(), row)
+                   .inserted_primary_key[0] for row in rows]
+        cls.count_rows(rows)
+        key_name, value_name = cls.LINK_COLUMNS
+        link_rows = [{key_name: row_id, value_name: linked_id}
+                     for row_id, linked in zip(ids, links)
+                     for linked_id in linked]
+        if link_rows:
+            db.session.execute(movie_actors_table.insert(), link_rows)
+            TableVersion.bump(table.name, movie_actors_table.name)
+        else:
+            TableVersion.bump(table.name)
+        record_change(table.name, ids)
+        record_change(cls.linked_model().__tablename__, [
+            link_row[value_name] for link_row in link_rows])
+        db.session.commit()
+        return ids
+
+    @classmethod
+    def update_links(cls, row_id, replace=None, add=(), remove=()):
+        key_column, value_column = (
+            movie_actors_table.c[name] for name in cls.LINK_COLUMNS)
+        current = set(linked_id for (linked_id,) in db.session.query(
+            value_column).filter(key_column == row_id))
+        target = set(current if replace is None else replace)
+        target = target.union(add).difference(remove)
+        added = target - current
+        linked_model = cls.linked_model()
+        if added:
+            added = set(linked_id for (linked_id,) in db.session.query(
+                linked_model.id).filter(linked_model.id.in_(added)))
+        removed = current - target
+        if removed:
+            db.session.execute(movie_actors_table.delete().where(
+                (key_column == row_id) & value_column.in_(removed)))
+        if added:
+            db.session.execute(movie_actors_table.insert(), [
+                {key_column.name: row_id, value_column.name: linked_id}
+                for linked_id in sorted(added)])
+        if added or removed:
+            TableVersion.bump(movie_actors_table.name)
+            record_change(cls.__tablename__, [row_id])
+            record_change(linked_model.__tablename__, added | removed)
+        return added, removed
+
+    @classmethod
+    def select_fields(cls, fields):
+        names = ['id'] + [field for field in fields
+                          if field not in ('id', cls.LINK_FIELD)]
+        return [getattr(cls, name) for name in names]
+
+    @classmethod
+    def load_formatted(cls, row_id, fields=None):
+        fields = fields or cls.FIELDS
+        row = cls.query.with_entities(*cls.select_fields(fields)).filter(
+            cls.id == row_id).first()
+        return cls.format_many([row], fields)[0] if row else None
+
+    @classmethod
+    def format_many(cls, rows, fields=None, all_rows=False):
+        fields = fields or cls.FIELDS
+        links = {}
+        if cls.LINK_FIELD in fields:
+            key_column, value_column = (
+                movie_actors_table.c[name] for name in cls.LINK_COLUMNS)
+            links = linked_ids(key_column, value_column,
+                               None if all_rows else [row.id for row in rows])
+        return [cls.format_row(row, fields, links.get(row.id, []))
+                for row in rows]
+
+    @classmethod
+    def format_row(cls, row, fields, linked_ids):
+        data = {}
+        for field in fields:
+            if field == cls.LINK_FIELD:
+                data[field] = linked_ids
+            else:
+                data[field] = cls.format_value(field, getattr(row, field))
+        return data
+
+    @staticmethod
+    def format_value(field, value):
+        return value
+
 
 class Actor(CrudModel):
     __tablename__ = 'actors'
+    FIELDS = ('id', 'name', 'age', 'gender', 'movies')
+    LINK_FIELD = 'movies'
+    LINK_COLUMNS = ('actor_id', 'movie_id')
+    STAT_COUNTERS = {
+        'actors_by_gender': ('gender', lambda gender: gender.name.lower())
+    }
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String, nullable=False)
-    age = db.Column(db.Integer, nullable=False)
+    name = db.Column(db.String, nullable=False, index=True)
+    age = db.Column(db.Integer, nullable=False, index=True)
     gender = db.Column(db.Enum(Gender), nullable=False)
     movies = db.relationship('Movie', secondary=movie_actors_table, lazy=True)
 
@@ -51,20 +372,42 @@ class Actor(CrudModel):
         self.gender = gender
 
     def format(self):
-        return {
-            'id': self.id,
-            'name': self.name,
-            'age': self.age,
-            'gender': self.gender.name.lower(),
-            'movies': [movie.id for movie in self.movies]
-        }
+        return self.format_row(self, self.FIELDS,
+                               [movie.id for movie in self.movies])
+
+    @classmethod
+    def costars(cls, actor_id, limit, offset=0):
+        # Actors sharing a movie with actor_id, most shared movies first.
+        cast = movie_actors_table.alias('cast')
+        costar = movie_actors_table.alias('costar')
+        shared = func.count(costar.c.movie_id).label('shared_movies')
+        return db.session.query(cls.id, cls.name, shared).select_from(
+            cast).join(costar, and_(
+                costar.c.movie_id == cast.c.movie_id,
+                costar.c.actor_id != cast.c.actor_id)).join(
+            cls, cls.id == costar.c.actor_id).filter(
+            cast.c.actor_id == actor_id).group_by(cls.id, cls.name).order_by(
+            shared.desc(), cls.id).limit(limit).offset(offset).all()
+
+    @staticmethod
+    def format_value(field, value):
+        if field == 'gender':
+            return value.name.lower()
+        return value
 
 
 class Movie(CrudModel):
     __tablename__ = 'movies'
+    FIELDS = ('id', 'title', 'release_date', 'actors')
+    LINK_FIELD = 'actors'
+    LINK_COLUMNS = ('movie_id', 'actor_id')
+    STAT_COUNTERS = {
+        'movies_by_year': ('release_date', lambda released: str(released.year))
+    }
     id = db.Column(db.Integer, primary_key=True)
-    title = db.Column(db.String, nullable=False)
-    release_date = db.Column(db.DateTime(timezone=True), nullable=False)
+    title = db.Column(db.String, nullable=False, index=True)
+    release_date = db.Column(db.DateTime(timezone=True), nullable=False,
+                             index=True)
     actors = db.relationship('Actor', secondary=movie_actors_table, lazy=True)
 
     def __init__(self, title, release_date):
@@ -72,9 +415,33 @@ class Movie(CrudModel):
         self.release_date = release_date
 
     def format(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'release_date': self.release_date,
-            'actors': [actor.id for actor in self.actors]
-        }
+        return self.format_row(self, self.FIELDS,
+                               [actor.id for actor in self.actors])
+
+    @classmethod
+    def title_prefix(cls, prefix):
+        dialect = db.session.get_bind().dialect.name
+        pattern = title_prefix_pattern(prefix, dialect)
+        if dialect == 'sqlite':
+            return cls.title.op('GLOB')(pattern)
+        return cls.title.like(pattern, escape='\\')
+
+
+def title_prefix_pattern(prefix, dialect):
+    # Case sensitive on every database, and a range scan on the title
+    # index: GLOB on SQLite, where LIKE ignores case and skips the index,
+    # LIKE with the text_pattern_ops index elsewhere.
+    if dialect == 'sqlite':
+        return re.sub(r'([*?[])', r'[\1]', prefix) + '*'
+    return prefix.replace('\\', '\\\\').replace('%', '\\%').replace(
+        '_', '\\_') + '%'
+
+
+# LIKE 'prefix%' on title is served by this index on Postgres, whatever
+# the database collation. Created outside the metadata since other
+# databases have no operator classes.
+TITLE_PATTERN_INDEX = 'ix_movies_title_pattern'
+TITLE_PATTERN_DDL = DDL(
+    f'CREATE INDEX {TITLE_PATTERN_INDEX} ON movies (title text_pattern_ops)')
+event.listen(Movie.__table__, 'after_create',
+             TITLE_PATTERN_DDL.execute_if(dialect='postgresql'))
@@ -0,0 +1,121 @@
+import os
+import time
+import threading
+
+from sqlalchemy import exc
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+from src.metrics import (
+    DB_POOL_CHECKOUTS, DB_POOL_TIMEOUTS, DB_POOL_WAIT, DB_POOL_CHECKED_OUT,
+    DB_POOL_OVERFLOW)
+
+
+class InstrumentedQueuePool(QueuePool):
+    # Metrics label, set by the app for each engine it creates.
+    database = ''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            DB_POOL_TIMEOUTS.labels(self.database).inc()
+            raise
+        finally:
+            waited = time.perf_counter() - started
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_time += waited
+                self.max_wait_time = max(self.max_wait_time, waited)
+            DB_POOL_CHECKOUTS.labels(self.database).inc()
+            DB_POOL_WAIT.labels(self.database).observe(waited)
+            self.update_gauges()
+
+    def _do_return_conn(self, conn):
+        super()._do_return_conn(conn)
+        self.update_gauges()
+
+    def update_gauges(self):
+        DB_POOL_CHECKED_OUT.labels(self.database).set(self.checkedout())
+        DB_POOL_OVERFLOW.labels(self.database).set(max(0, self.overflow()))
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.database = self.database
+        return pool
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                'size': self.size(),
+                'checked_in': self.checkedin(),
+                'checked_out': self.checkedout(),
+                'overflow': max(0, self.overflow()),
+                'max_overflow': self._max_overflow,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_time_total_ms': self.wait_time * 1000,
+                'wait_time_max_ms': self.max_wait_time * 1000,
+                'wait_time_avg_ms': self.wait_time * 1000 / self.checkouts
+                if self.checkouts else 0.0
+            }
+
+
+def env_flag(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def engine_options(url):
+    backend = make_url(url).get_backend_name() if url else None
+    if backend in (None, 'sqlite'):
+        # SQLite gets a static or null pool from Flask-SQLAlchemy, none of
+        # the queue pool settings apply.
+        return {}
+    options = {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': float(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True)
+    }
+    if backend in ('postgres', 'postgresql'):
+        settings = [
+            ('statement_timeout', os.environ.get('DB_STATEMENT_TIMEOUT')),
+            ('idle_in_transaction_session_timeout',
+             os.environ.get('DB_IDLE_IN_TRANSACTION_TIMEOUT'))
+        ]
+        server_options = ' '.join(f'-c {name}={int(value)}'
+                                  for name, value in settings if value)
+        if server_options:
+            options['connect_args'] = {'options': server_options}
+    return options
+
+
+def pool_label(url):
+    # No credentials in metric labels.
+    url = make_url(url)
+    return f"{url.host or ''}/{url.database or ''}"
+
+
+def pool_stats(engine):
+    pool = engine.pool
+    if isinstance(pool, InstrumentedQueuePool):
+        stats = pool.stats()
+    else:
+        stats = {}
+    return dict(stats, pool=type(pool).__name__)
@@ -0,0 +1,163 @@
+import threading
+from functools import partial, wraps
+
+from flask import g, has_app_context
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, exc, orm, text
+from sqlalchemy.sql.dml import UpdateBase
+
+from src.pool import InstrumentedQueuePool, pool_label
+
+
+REPLICA_STRATEGIES = ('round_robin', 'least_connections')
+
+
+def replica_binds(urls):
+    urls = [url.strip() for url in (urls or '').split(',') if url.strip()]
+    return {f'replica_{index}': url for index, url in enumerate(urls)}
+
+
+def checked_out(engine):
+    checkedout = getattr(engine.pool, 'checkedout', None)
+    return checkedout() if checkedout else 0
+
+
+class ReplicaSet:
+    def __init__(self, names, strategy='round_robin', check_interval=10):
+        if strategy not in REPLICA_STRATEGIES:
+            raise ValueError(f'Unknown replica strategy: {strategy}')
+        self.names = list(names)
+        self.strategy = strategy
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._next = 0
+        self._health = {}
+        self._checker = None
+        self._stopped = threading.Event()
+
+    @staticmethod
+    def probe(engine):
+        try:
+            with engine.connect() as conn:
+                conn.execute(text('SELECT 1'))
+            return True
+        except exc.SQLAlchemyError:
+            return False
+
+    def check(self, get_engine):
+        for name in self.names:
+            healthy = self.probe(get_engine(name))
+            with self._lock:
+                self._health[name] = healthy
+
+    def watch(self, get_engine):
+        # The first round of checks runs in the first request that needs a
+        # replica, later rounds in a background thread, so requests never
+        # wait on an unreachable replica after that.
+        with self._lock:
+            if self._checker is not None:
+                return
+            self._checker = threading.Thread(
+                target=self.run_checks, args=(get_engine,),
+                name='replica-health', daemon=True)
+        self.check(get_engine)
+        self._checker.start()
+
+    def run_checks(self, get_engine):
+        while not self._stopped.wait(self.check_interval):
+            self.check(get_engine)
+
+    def stop(self):
+        self._stopped.set()
+        if self._checker is not None and self._checker.is_alive():
+            self._checker.join()
+
+    def healthy(self, name):
+        with self._lock:
+            return self._health.get(name, False)
+
+    def choose(self, get_engine):
+        self.watch(get_engine)
+        candidates = [get_engine(name) for name in self.names
+                      if self.healthy(name)]
+        if not candidates:
+            return None
+        if self.strategy == 'least_connections':
+            return min(candidates, key=checked_out)
+        with self._lock:
+            index = self._next
+            self._next += 1
+        return candidates[index % len(candidates)]
+
+
+class RoutingSession(SignallingSession):
+    def __init__(self, db, **options):
+        self.db = db
+        super().__init__(db, **options)
+
+    def get_bind(self, mapper=None, clause=None):
+        if isinstance(clause, UpdateBase):
+            mark_written()
+        elif reading_from_replica():
+            replica = g.get('replica')
+            if replica is None:
+                replicas = self.app.extensions.get('replicas')
+                if replicas:
+                    # Not bound to this session, the health checks keep
+                    # using it.
+                    replica = replicas.choose(
+                        partial(self.db.get_engine, self.app))
+                # False remembers that no replica is available for the
+                # rest of the request.
+                g.replica = replica or False
+            if replica:
+                return replica
+        return super().get_bind(mapper, clause)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def flushing(session, flush_context, instances):
+    mark_written()
+
+
+def reading_from_replica():
+    return has_app_context() and g.get('read_only', False)
+
+
+def mark_written():
+    # Everything after a write, reads included, stays on the primary so
+    # the request sees its own changes.
+    if has_app_context():
+        g.read_only = False
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def create_engine(self, sa_url, engine_opts):
+        engine = super().create_engine(sa_url, engine_opts)
+        if isinstance(engine.pool, InstrumentedQueuePool):
+            engine.pool.database = pool_label(sa_url)
+        return engine
+
+
+def init_replicas(app, strategy='round_robin', check_interval=10):
+    names = [name for name in app.config.get('SQLALCHEMY_BINDS') or {}
+             if name.startswith('replica_')]
+    if names:
+        app.extensions['replicas'] = ReplicaSet(
+            sorted(names), strategy, check_interval)
+
+    @app.before_request
+    def reset_routing():
+        g.pop('read_only', None)
+        g.pop('replica', None)
+
+
+def read_only(f):
+    @wraps(f)
+    def wrapper(*args, **kwargs):
+        g.read_only = True
+        return f(*args, **kwargs)
+    return wrapper
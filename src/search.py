@@ -0,0 +1,169 @@
+import re
+
+from sqlalchemy import event, text, bindparam
+
+from src.models import db, Actor, Movie, TITLE_PATTERN_INDEX
+
+
+SEARCH_TABLE = 'search_index'
+
+# kind -> (table, searched column, rowid offset for the SQLite FTS table)
+SEARCH_KINDS = {
+    'actor': ('actors', 'name', 0),
+    'movie': ('movies', 'title', 1)
+}
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+    "kind UNINDEXED, ref_id UNINDEXED, body, tokenize='unicode61')"
+] + [
+    statement
+    for kind, (table, column, offset) in SEARCH_KINDS.items()
+    for statement in (
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert "
+        f"AFTER INSERT ON {table} BEGIN "
+        f"INSERT INTO search_index (rowid, kind, ref_id, body) "
+        f"VALUES (new.id * 2 + {offset}, '{kind}', new.id, new.{column}); "
+        f"END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_update "
+        f"AFTER UPDATE OF {column} ON {table} BEGIN "
+        f"UPDATE search_index SET body = new.{column} "
+        f"WHERE rowid = old.id * 2 + {offset}; "
+        f"END",
+        f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete "
+        f"AFTER DELETE ON {table} BEGIN "
+        f"DELETE FROM search_index WHERE rowid = old.id * 2 + {offset}; "
+        f"END"
+    )
+]
+
+SQLITE_DROP = [
+    f'DROP TRIGGER IF EXISTS {table}_search_{operation}'
+    for table, _, _ in SEARCH_KINDS.values()
+    for operation in ('insert', 'update', 'delete')
+] + ['DROP TABLE IF EXISTS search_index']
+
+POSTGRES_DDL = [
+    "CREATE TABLE IF NOT EXISTS search_index ("
+    "kind VARCHAR NOT NULL, ref_id INTEGER NOT NULL, body VARCHAR NOT NULL, "
+    "document TSVECTOR NOT NULL, PRIMARY KEY (kind, ref_id))",
+    "CREATE INDEX IF NOT EXISTS ix_search_index_document "
+    "ON search_index USING GIN (document)"
+] + [
+    statement
+    for kind, (table, column, _) in SEARCH_KINDS.items()
+    for statement in (
+        f"CREATE OR REPLACE FUNCTION {table}_search_sync() "
+        f"RETURNS trigger AS $$ BEGIN "
+        f"IF TG_OP = 'DELETE' THEN "
+        f"DELETE FROM search_index WHERE kind = '{kind}' "
+        f"AND ref_id = OLD.id; RETURN OLD; END IF; "
+        f"INSERT INTO search_index (kind, ref_id, body, document) "
+        f"VALUES ('{kind}', NEW.id, NEW.{column}, "
+        f"to_tsvector('simple', NEW.{column})) "
+        f"ON CONFLICT (kind, ref_id) DO UPDATE "
+        f"SET body = EXCLUDED.body, document = EXCLUDED.document; "
+        f"RETURN NEW; END $$ LANGUAGE plpgsql",
+        f"DROP TRIGGER IF EXISTS {table}_search_sync ON {table}",
+        f"CREATE TRIGGER {table}_search_sync "
+        f"AFTER INSERT OR UPDATE OF {column} OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {table}_search_sync()"
+    )
+]
+
+POSTGRES_DROP = [
+    statement
+    for table, _, _ in SEARCH_KINDS.values()
+    for statement in (
+        f'DROP TRIGGER IF EXISTS {table}_search_sync ON {table}',
+        f'DROP FUNCTION IF EXISTS {table}_search_sync()'
+    )
+] + ['DROP TABLE IF EXISTS search_index']
+
+DDL = {'sqlite': SQLITE_DDL, 'postgresql': POSTGRES_DDL}
+DROP = {'sqlite': SQLITE_DROP, 'postgresql': POSTGRES_DROP}
+
+
+def creates_searched_tables(target, tables):
+    names = set(table.name for table in (
+        target.sorted_tables if tables is None else tables))
+    return all(table in names for table, _, _ in SEARCH_KINDS.values())
+
+
+@event.listens_for(db.metadata, 'after_create')
+def create_search_index(target, connection, tables=None, **kw):
+    if not creates_searched_tables(target, tables):
+        return
+    for statement in DDL.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def drop_search_index(target, connection, tables=None, **kw):
+    if not creates_searched_tables(target, tables):
+        return
+    for statement in DROP.get(connection.dialect.name, []):
+        connection.execute(text(statement))
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The search index (and the SQLite FTS shadow tables) and the title
+    # pattern index are dialect specific DDL, not part of the metadata, so
+    # autogenerate must not try to drop them.
+    if reflected and type_ == 'index':
+        return name != TITLE_PATTERN_INDEX
+    return not (reflected and type_ == 'table' and (
+        name == SEARCH_TABLE or name.startswith(f'{SEARCH_TABLE}_')))
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())
+
+
+def search(query, kinds, limit, offset=0):
+    terms = search_terms(query)
+    if not terms:
+        return []
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        rows = db.session.execute(text(
+            "SELECT kind, ref_id, body, bm25(search_index) AS rank "
+            "FROM search_index WHERE search_index MATCH :match "
+            "AND kind IN :kinds ORDER BY rank, rowid "
+            "LIMIT :limit OFFSET :offset").bindparams(
+                bindparam('kinds', expanding=True)), {
+            'match': ' '.join(f'"{term}"*' for term in terms),
+            'kinds': list(kinds),
+            'limit': limit,
+            'offset': offset
+        })
+        return [(kind, ref_id, body, -rank)
+                for kind, ref_id, body, rank in rows]
+    if dialect == 'postgresql':
+        rows = db.session.execute(text(
+            "SELECT kind, ref_id, body, ts_rank(document, query) AS rank "
+            "FROM search_index, to_tsquery('simple', :match) query "
+            "WHERE document @@ query AND kind IN :kinds "
+            "ORDER BY rank DESC, kind, ref_id "
+            "LIMIT :limit OFFSET :offset").bindparams(
+                bindparam('kinds', expanding=True)), {
+            'match': ' & '.join(f'{term}:*' for term in terms),
+            'kinds': list(kinds),
+            'limit': limit,
+            'offset': offset
+        })
+        return [tuple(row) for row in rows]
+    return search_unindexed(terms, kinds, limit, offset)
+
+
+def search_unindexed(terms, kinds, limit, offset):
+    results = []
+    for kind, model, column in (('actor', Actor, Actor.name),
+                                ('movie', Movie, Movie.title)):
+        if kind not in kinds:
+            continue
+        rows = db.session.query(model.id, column).filter(
+            *[column.ilike(f'%{term}%') for term in terms])
+        results.extend((kind, row_id, body, 0.0) for row_id, body in rows)
+    results.sort(key=lambda result: (result[0], result[1]))
+    return results[offset:offset + limit]
@@ -0,0 +1,117 @@
+import os
+import json
+from datetime import date, time
+
+from flask import current_app, request, abort
+from flask.json import JSONEncoder as FlaskJSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+JSON_BACKENDS = ('orjson', 'stdlib')
+JSON_MIMETYPE = 'application/json'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+_backend = None
+
+
+def available_json_backends():
+    return [name for name in JSON_BACKENDS
+            if name != 'orjson' or orjson is not None]
+
+
+def select_json_backend(name=None):
+    global _backend
+    name = name or os.environ.get('JSON_BACKEND', 'auto')
+    if name == 'auto':
+        name = available_json_backends()[0]
+    if name not in available_json_backends():
+        raise ValueError(f'Unsupported JSON backend: {name}')
+    _backend = name
+    return name
+
+
+def current_json_backend():
+    return _backend or select_json_backend()
+
+
+def default(value):
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    raise TypeError(f'Object of type {type(value).__name__} '
+                    'is not JSON serializable')
+
+
+def dumps(value, sort_keys=False):
+    if current_json_backend() == 'orjson':
+        return orjson.dumps(value, default=default, option=(
+            orjson.OPT_SORT_KEYS if sort_keys else 0))
+    return json.dumps(value, default=default, sort_keys=sort_keys,
+                      separators=(',', ':')).encode()
+
+
+def response_data(args, kwargs):
+    if args and kwargs:
+        raise TypeError('behavior undefined when passed both args and '
+                        'kwargs')
+    return args[0] if len(args) == 1 else (args or kwargs)
+
+
+def jsonify(*args, **kwargs):
+    return current_app.response_class(
+        dumps(response_data(args, kwargs),
+              current_app.config['JSON_SORT_KEYS']) + b'\n',
+        mimetype=current_app.config['JSONIFY_MIMETYPE'])
+
+
+def response_mimetypes():
+    return [JSON_MIMETYPE] + (list(MSGPACK_MIMETYPES) if msgpack else [])
+
+
+def response_format():
+    # JSON comes first so it wins ties, e.g. for */* or no Accept header.
+    return request.accept_mimetypes.best_match(
+        response_mimetypes(), default=JSON_MIMETYPE)
+
+
+def render(*args, **kwargs):
+    mimetype = response_format()
+    if mimetype == JSON_MIMETYPE:
+        response = jsonify(*args, **kwargs)
+    else:
+        response = current_app.response_class(msgpack.packb(
+            response_data(args, kwargs), default=default,
+            use_bin_type=True), mimetype=mimetype)
+    response.vary.add('Accept')
+    return response
+
+
+def request_data():
+    if request.mimetype not in MSGPACK_MIMETYPES:
+        return request.get_json()
+    if msgpack is None:
+        abort(415, 'MessagePack request bodies are not supported')
+    try:
+        return msgpack.unpackb(request.get_data(), raw=False)
+    except (ValueError, TypeError, msgpack.UnpackException):
+        abort(400, 'Failed to decode MessagePack body')
+
+
+class JSONEncoder(FlaskJSONEncoder):
+    # Anything still going through flask.json (request parsing helpers,
+    # extensions) renders dates the same way as jsonify above.
+    def default(self, value):
+        try:
+            return default(value)
+        except TypeError:
+            return super().default(value)
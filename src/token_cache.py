@@ -0,0 +1,74 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+from src.metrics import CACHE_REQUESTS, CACHE_EVICTIONS
+
+
+class TokenCache:
+    def __init__(self, maxsize=None):
+        self._maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def maxsize(self):
+        if self._maxsize is not None:
+            return self._maxsize
+        return int(os.environ.get('TOKEN_CACHE_SIZE', 1024))
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, expires_at = entry
+                if expires_at > time.time():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    CACHE_REQUESTS.labels('tokens', 'hit').inc()
+                    return payload
+                del self._entries[key]
+            self.misses += 1
+        CACHE_REQUESTS.labels('tokens', 'miss').inc()
+        return None
+
+    def set(self, token, payload):
+        expires_at = payload.get('exp')
+        if not isinstance(expires_at, (int, float)) or self.maxsize <= 0:
+            return
+        key = self.key(token)
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+                CACHE_EVICTIONS.labels('tokens').inc()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
+
+
+token_cache = TokenCache()
@@ -1,12 +1,18 @@
+import json
+
+import pytest
 from flask_sqlalchemy import SQLAlchemy
 
-from src.models import Actor
+from src.models import Actor, Gender, Movie
 from src.auth import UserRole
 
 
 db = SQLAlchemy()
 
+pytestmark = pytest.mark.query_budget(max_queries=10)
+
 
+@pytest.mark.query_budget(max_queries=3)
 def test_get_actor(client, auth):
     actor_id = 1
     res = client.get(f'/api/actors/{actor_id}', headers={
@@ -31,13 +37,15 @@ def test_get_actor_not_found(client, auth):
     assert data['message'] == 'Actor not found'
 
 
+@pytest.mark.query_budget(max_queries=3)
 def test_get_actors(client, auth):
     res = client.get('/api/actors', headers={
         'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
     data = res.get_json()
     assert res.status_code == 200
-    assert isinstance(data, list)
-    for actor in data:
+    assert isinstance(data, dict)
+    assert data['next_cursor'] is None
+    for actor in data['actors']:
         assert 'id' in actor
         assert 'name' in actor
         assert 'age' in actor
@@ -45,6 +53,188 @@ def test_get_actors(client, auth):
         assert 'movies' in actor
 
 
+def test_get_actors_paginated(client, auth):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    res = client.get('/api/actors?limit=1', headers=headers)
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [actor['id'] for actor in data['actors']] == [1]
+    assert data['next_cursor'] is not None
+    res = client.get(f"/api/actors?limit=1&cursor={data['next_cursor']}",
+                     headers=headers)
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [actor['id'] for actor in data['actors']] == [2]
+    assert data['next_cursor'] is None
+
+
+def test_get_actors_page_size_is_capped(client, auth):
+    client.application.config['MAX_PAGE_SIZE'] = 1
+    res = client.get('/api/actors?limit=1000', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert len(data['actors']) == 1
+    assert data['next_cursor'] is not None
+
+
+def test_get_actors_invalid_cursor(client, auth):
+    res = client.get('/api/actors?cursor=notacursor', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 400
+    assert data['message'] == 'Invalid cursor'
+
+
+def test_get_actors_all(client, auth):
+    res = client.get('/api/actors?all=true', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [actor['id'] for actor in data] == [1, 2]
+
+
+def test_get_actors_query_count_is_constant(client, auth, queries):
+    movies = Movie.query.all()
+    for i in range(20):
+        actor = Actor(f'Actor {i}', 30, Gender.MALE)
+        actor.movies = movies
+        actor.insert()
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    counts = []
+    for url in ('/api/actors?limit=1', '/api/actors?limit=20',
+                '/api/actors?all=true', '/api/actors/3'):
+        del queries[:]
+        assert client.get(url, headers=headers).status_code == 200
+        counts.append(len(queries))
+    assert counts == [3, 3, 3, 3]
+
+
+def test_get_actors_sparse_fields(client, auth, queries):
+    res = client.get('/api/actors?fields=id,name', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    for actor in data['actors']:
+        assert set(actor) == {'id', 'name'}
+    assert not any('movie_actors' in statement for statement in queries)
+    assert not any('actors.age' in statement for statement in queries)
+
+
+def test_get_actor_sparse_fields(client, auth):
+    res = client.get('/api/actors/1?fields=id,name', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert set(data) == {'id', 'name'}
+
+
+def test_get_actors_invalid_fields(client, auth):
+    res = client.get('/api/actors?fields=id,salary', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 400
+    assert data['message'] == 'Invalid fields: salary'
+
+
+def test_get_actors_not_modified(client, auth, queries):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    res = client.get('/api/actors', headers=headers)
+    etag = res.headers['ETag']
+    assert res.status_code == 200
+    assert res.headers['Cache-Control'] == 'private, no-cache'
+    del queries[:]
+    res = client.get('/api/actors', headers={
+        **headers, 'If-None-Match': etag})
+    assert res.status_code == 304
+    assert res.headers['ETag'] == etag
+    assert len(queries) == 1
+    res = client.get('/api/actors?limit=1', headers={
+        **headers, 'If-None-Match': etag})
+    assert res.status_code == 200
+
+
+def test_get_actor_etag_changes_on_write(client, auth):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    etag = client.get('/api/actors/1', headers=headers).headers['ETag']
+    res = client.patch('/api/actors/2', json={'name': 'Jane Doe'}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    assert res.status_code == 200
+    res = client.get('/api/actors/1', headers={
+        **headers, 'If-None-Match': etag})
+    assert res.status_code == 200
+    assert res.headers['ETag'] != etag
+
+
+def test_get_actors_stream_json(client, auth):
+    client.application.config['STREAM_CHUNK_SIZE'] = 1
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    res = client.get('/api/actors?stream=json', headers=headers)
+    assert res.status_code == 200
+    assert res.mimetype == 'application/json'
+    assert json.loads(res.get_data()) == client.get(
+        '/api/actors?all=true', headers=headers).get_json()
+
+
+def test_get_actors_stream_ndjson(client, auth):
+    client.application.config['STREAM_CHUNK_SIZE'] = 1
+    res = client.get('/api/actors?stream=ndjson&fields=id', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    assert res.status_code == 200
+    assert res.mimetype == 'application/x-ndjson'
+    lines = res.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == [{'id': 1}, {'id': 2}]
+
+
+def test_get_actors_filtered(client, auth):
+    Actor('Lisa Mcdowell', 25, Gender.FEMALE).insert()
+    Actor('Angela Rubius', 31, Gender.FEMALE).insert()
+    res = client.get('/api/actors?gender=female&age_min=20&age_max=30',
+                     headers={'Authorization': auth.bearer_token(
+                         UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [actor['name'] for actor in data['actors']] == ['Lisa Mcdowell']
+
+
+def test_get_actors_filtered_empty(client, auth):
+    res = client.get('/api/actors?age_min=90', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert data['actors'] == []
+
+
+def test_get_actors_sorted_paginated(client, auth):
+    Actor('Lisa Mcdowell', 23, Gender.FEMALE).insert()
+    Actor('Angela Rubius', 31, Gender.FEMALE).insert()
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    ids = []
+    cursor = ''
+    while cursor is not None:
+        res = client.get(f'/api/actors?sort=-age&limit=1&fields=id'
+                         f'&cursor={cursor}', headers=headers)
+        data = res.get_json()
+        assert res.status_code == 200
+        ids.extend(actor['id'] for actor in data['actors'])
+        cursor = data['next_cursor']
+    assert ids == [4, 3, 1, 2]
+
+
+def test_get_actors_invalid_filters(client, auth):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    for query in ('gender=other', 'age_min=old', 'sort=salary'):
+        res = client.get(f'/api/actors?{query}', headers=headers)
+        assert res.status_code == 400
+
+
 def test_get_actors_not_found(client, auth):
     Actor.query.delete()
     db.session.commit()
@@ -173,6 +363,34 @@ def test_patch_actor_with_gender_movies(client, auth):
     assert set(movie.id for movie in actor.movies) == set(patch_data['movies'])
 
 
+def test_patch_actor_keeps_movies_when_omitted(client, auth):
+    actor_id = 2
+    client.patch(f'/api/actors/{actor_id}', json={'movies': [1, 2]}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    res = client.patch(f'/api/actors/{actor_id}', json={'age': 20}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    assert res.status_code == 200
+    actor = Actor.query.get(actor_id)
+    assert set(movie.id for movie in actor.movies) == {1, 2}
+
+
+def test_patch_actor_add_remove_movies(client, auth, queries):
+    actor_id = 2
+    client.patch(f'/api/actors/{actor_id}', json={'movies': [1]}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    del queries[:]
+    patch_data = {
+        'add_movies': [2, 99],
+        'remove_movies': [1]
+    }
+    res = client.patch(f'/api/actors/{actor_id}', json=patch_data, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    assert res.status_code == 200
+    assert not any('movies.title' in statement for statement in queries)
+    actor = Actor.query.get(actor_id)
+    assert [movie.id for movie in actor.movies] == [2]
+
+
 def test_patch_actor_not_found(client, auth):
     actor_id = 99
     patch_data = {
@@ -186,3 +404,66 @@ def test_patch_actor_not_found(client, auth):
     assert data['success'] is False
     assert data['error'] == 404
     assert data['message'] == 'Actor not found'
+
+
+# SQLite has no RETURNING, batch rows are inserted one by one for their ids
+@pytest.mark.query_budget(max_queries=10, max_repeats=None)
+def test_post_actors_batch(client, auth, queries):
+    post_data = {'actors': [
+        {'name': 'Lisa Mcdowell', 'age': 70, 'gender': 'female',
+         'movies': [1, 2, 99]},
+        {'name': 'Tom Mcdowell', 'age': 72, 'gender': 'male'}
+    ]}
+    res = client.post('/api/actors/batch', json=post_data, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert data['success'] is True
+    assert [result['index'] for result in data['results']] == [0, 1]
+    actor = Actor.query.get(data['results'][0]['id'])
+    assert actor.name == 'Lisa Mcdowell'
+    assert set(movie.id for movie in actor.movies) == {1, 2}
+    assert Actor.query.get(data['results'][1]['id']).movies == []
+    assert sum(statement.startswith('INSERT INTO movie_actors')
+               for statement in queries) == 1
+
+
+def test_post_actors_batch_atomic_rejects_all(client, auth):
+    post_data = {'actors': [
+        {'name': 'Lisa Mcdowell', 'age': 70, 'gender': 'female'},
+        {'name': 'Angela Rubius', 'age': None, 'gender': 'female'},
+        {'name': 'Tom Mcdowell', 'gender': 'male'}
+    ]}
+    res = client.post('/api/actors/batch', json=post_data, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    data = res.get_json()
+    assert res.status_code == 422
+    assert data['success'] is False
+    assert 'id' not in data['results'][0]
+    assert data['results'][1]['error'] == \
+        'age must be a non-negative integer'
+    assert data['results'][2]['error'] == 'Missing field: age'
+    assert Actor.query.count() == 2
+
+
+# SQLite has no RETURNING, batch rows are inserted one by one for their ids
+@pytest.mark.query_budget(max_queries=10, max_repeats=None)
+def test_post_actors_batch_best_effort(client, auth):
+    post_data = {'mode': 'best_effort', 'actors': [
+        {'name': 'Lisa Mcdowell', 'age': 70, 'gender': 'female'},
+        {'name': 'Angela Rubius', 'age': 40, 'gender': 'unknown'}
+    ]}
+    res = client.post('/api/actors/batch', json=post_data, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert Actor.query.get(data['results'][0]['id']) is not None
+    assert 'id' not in data['results'][1]
+    assert 'error' in data['results'][1]
+    assert Actor.query.count() == 3
+
+
+def test_post_actors_batch_empty(client, auth):
+    res = client.post('/api/actors/batch', json={'actors': []}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    assert res.status_code == 400
@@ -1,12 +1,20 @@
+import json
+from datetime import date
+
+import pytest
 from flask_sqlalchemy import SQLAlchemy
 
-from src.models import Movie
+from src.api.pagination import encode_cursor
+from src.models import Actor, Movie
 from src.auth import UserRole
 
 
 db = SQLAlchemy()
 
+pytestmark = pytest.mark.query_budget(max_queries=10)
+
 
+@pytest.mark.query_budget(max_queries=3)
 def test_get_movie(client, auth):
     movie_id = 1
     res = client.get(f'/api/movies/{movie_id}', headers={
@@ -30,19 +38,246 @@ def test_get_movie_not_found(client, auth):
     assert data['message'] == 'Movie not found'
 
 
+@pytest.mark.query_budget(max_queries=3)
 def test_get_movies(client, auth):
     res = client.get('/api/movies', headers={
         'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
     data = res.get_json()
     assert res.status_code == 200
-    assert isinstance(data, list)
-    for movie in data:
+    assert isinstance(data, dict)
+    assert data['next_cursor'] is None
+    for movie in data['movies']:
         assert 'id' in movie
         assert 'title' in movie
         assert 'release_date' in movie
         assert 'actors' in movie
 
 
+def test_get_movies_paginated(client, auth):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    res = client.get('/api/movies?limit=1', headers=headers)
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [movie['id'] for movie in data['movies']] == [1]
+    assert data['next_cursor'] is not None
+    res = client.get(f"/api/movies?limit=1&cursor={data['next_cursor']}",
+                     headers=headers)
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [movie['id'] for movie in data['movies']] == [2]
+    assert data['next_cursor'] is None
+
+
+def test_get_movies_page_size_is_capped(client, auth):
+    client.application.config['MAX_PAGE_SIZE'] = 1
+    res = client.get('/api/movies?limit=1000', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert len(data['movies']) == 1
+    assert data['next_cursor'] is not None
+
+
+def test_get_movies_invalid_cursor(client, auth):
+    res = client.get('/api/movies?cursor=notacursor', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 400
+    assert data['message'] == 'Invalid cursor'
+
+
+def test_get_movies_all(client, auth):
+    res = client.get('/api/movies?all=true', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [movie['id'] for movie in data] == [1, 2]
+
+
+def test_get_movies_query_count_is_constant(client, auth, queries):
+    actors = Actor.query.all()
+    for i in range(20):
+        movie = Movie(f'Movie {i}', date(2021, 1, 1))
+        movie.actors = actors
+        movie.insert()
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    counts = []
+    for url in ('/api/movies?limit=1', '/api/movies?limit=20',
+                '/api/movies?all=true', '/api/movies/3'):
+        del queries[:]
+        assert client.get(url, headers=headers).status_code == 200
+        counts.append(len(queries))
+    assert counts == [3, 3, 3, 3]
+
+
+def test_get_movies_sparse_fields(client, auth, queries):
+    res = client.get('/api/movies?fields=id,title', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    for movie in data['movies']:
+        assert set(movie) == {'id', 'title'}
+    assert not any('movie_actors' in statement for statement in queries)
+    assert not any('movies.release_date' in statement for statement in queries)
+
+
+def test_get_movie_sparse_fields(client, auth):
+    res = client.get('/api/movies/1?fields=id,title', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert set(data) == {'id', 'title'}
+
+
+def test_get_movies_invalid_fields(client, auth):
+    res = client.get('/api/movies?fields=id,budget', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 400
+    assert data['message'] == 'Invalid fields: budget'
+
+
+def test_get_movies_not_modified(client, auth, queries):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    res = client.get('/api/movies', headers=headers)
+    etag = res.headers['ETag']
+    assert res.status_code == 200
+    assert res.headers['Cache-Control'] == 'private, no-cache'
+    del queries[:]
+    res = client.get('/api/movies', headers={
+        **headers, 'If-None-Match': etag})
+    assert res.status_code == 304
+    assert res.headers['ETag'] == etag
+    assert len(queries) == 1
+    res = client.get('/api/movies?limit=1', headers={
+        **headers, 'If-None-Match': etag})
+    assert res.status_code == 200
+
+
+def test_get_movie_etag_changes_on_write(client, auth):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    etag = client.get('/api/movies/1', headers=headers).headers['ETag']
+    res = client.patch('/api/movies/2', json={'title': 'Sequel'}, headers={
+        'Authorization': auth.bearer_token(UserRole.EXECUTIVE_PRODUCER)})
+    assert res.status_code == 200
+    res = client.get('/api/movies/1', headers={
+        **headers, 'If-None-Match': etag})
+    assert res.status_code == 200
+    assert res.headers['ETag'] != etag
+
+
+def test_get_movies_stream_json(client, auth):
+    client.application.config['STREAM_CHUNK_SIZE'] = 1
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    res = client.get('/api/movies?stream=json', headers=headers)
+    assert res.status_code == 200
+    assert res.mimetype == 'application/json'
+    assert json.loads(res.get_data()) == client.get(
+        '/api/movies?all=true', headers=headers).get_json()
+
+
+def test_get_movies_stream_ndjson(client, auth):
+    client.application.config['STREAM_CHUNK_SIZE'] = 1
+    res = client.get('/api/movies?stream=ndjson&fields=id', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    assert res.status_code == 200
+    assert res.mimetype == 'application/x-ndjson'
+    lines = res.get_data(as_text=True).splitlines()
+    assert [json.loads(line) for line in lines] == [{'id': 1}, {'id': 2}]
+
+
+def test_get_movies_filtered(client, auth):
+    Movie('Back to the past', date(2022, 1, 15)).insert()
+    res = client.get('/api/movies?release_from=2022-01-01'
+                     '&release_to=2022-12-31&title_prefix=Back',
+                     headers={'Authorization': auth.bearer_token(
+                         UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [movie['title'] for movie in data['movies']] == \
+        ['Back to the past']
+
+
+@pytest.mark.parametrize('prefix, titles', [
+    ('Back', ['Back to the future 4', 'Back*[2]?', 'Back_to 100%']),
+    ('back', []),
+    ('Back_', ['Back_to 100%']),
+    ('Back_to 100%', ['Back_to 100%']),
+    ('Back*', ['Back*[2]?']),
+    ('Back?', []),
+    ('Back*[2]?', ['Back*[2]?']),
+    ('\U0010ffff', []),
+])
+def test_get_movies_title_prefix(client, auth, prefix, titles):
+    Movie('Back_to 100%', date(2022, 1, 15)).insert()
+    Movie('Back*[2]?', date(2022, 1, 16)).insert()
+    res = client.get('/api/movies', query_string={
+        'title_prefix': prefix, 'sort': 'title'}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    assert res.status_code == 200
+    assert [movie['title'] for movie in res.get_json()['movies']] == titles
+
+
+def test_get_movies_invalid_title_prefix(client, auth):
+    res = client.get('/api/movies?title_prefix=Back%00', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    assert res.status_code == 400
+
+
+@pytest.mark.parametrize('sort, cursor', [
+    ('title', [1, 42, 'title']),
+    ('release_date', [1, 42, 'release_date']),
+    ('id', [True]),
+    ('-title', [True, 'Back', '-title']),
+])
+def test_get_movies_cursor_value_types(client, auth, sort, cursor):
+    res = client.get(
+        f'/api/movies?sort={sort}&cursor={encode_cursor(cursor)}',
+        headers={'Authorization': auth.bearer_token(
+            UserRole.CASTING_ASSISTANT)})
+    assert res.status_code == 400
+    assert res.get_json()['message'] == 'Invalid cursor'
+
+
+def test_get_movies_sorted_paginated(client, auth):
+    Movie('Back to the past', date(2022, 1, 15)).insert()
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    ids = []
+    cursor = ''
+    while cursor is not None:
+        res = client.get(f'/api/movies?sort=-release_date&limit=1'
+                         f'&cursor={cursor}', headers=headers)
+        data = res.get_json()
+        assert res.status_code == 200
+        ids.extend(movie['id'] for movie in data['movies'])
+        cursor = data['next_cursor']
+    assert ids == [2, 3, 1]
+
+
+def test_get_movies_cursor_must_match_sort(client, auth):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    data = client.get('/api/movies?sort=title&limit=1',
+                      headers=headers).get_json()
+    res = client.get(f"/api/movies?sort=-title&cursor={data['next_cursor']}",
+                     headers=headers)
+    assert res.status_code == 400
+
+
+def test_get_movies_invalid_filters(client, auth):
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    for query in ('release_from=yesterday', 'sort=budget'):
+        res = client.get(f'/api/movies?{query}', headers=headers)
+        assert res.status_code == 400
+
+
 def test_get_movies_not_found(client, auth):
     Movie.query.delete()
     db.session.commit()
@@ -162,6 +397,25 @@ def test_patch_movie_with_title_actors(client, auth):
     assert set(actor.id for actor in movie.actors) == set(patch_data['actors'])
 
 
+def test_patch_movie_add_remove_actors(client, auth):
+    movie_id = 1
+    patch_data = {
+        'actors': [1],
+        'add_actors': [2]
+    }
+    res = client.patch(f'/api/movies/{movie_id}', json=patch_data, headers={
+        'Authorization': auth.bearer_token(UserRole.EXECUTIVE_PRODUCER)})
+    assert res.status_code == 200
+    movie = Movie.query.get(movie_id)
+    assert set(actor.id for actor in movie.actors) == {1, 2}
+    res = client.patch(f'/api/movies/{movie_id}', json={
+        'remove_actors': [1]}, headers={
+        'Authorization': auth.bearer_token(UserRole.EXECUTIVE_PRODUCER)})
+    assert res.status_code == 200
+    movie = Movie.query.get(movie_id)
+    assert [actor.id for actor in movie.actors] == [2]
+
+
 def test_patch_movie_not_found(client, auth):
     movie_id = 99
     patch_data = {
@@ -174,3 +428,43 @@ def test_patch_movie_not_found(client, auth):
     assert data['success'] is False
     assert data['error'] == 404
     assert data['message'] == 'Movie not found'
+
+
+# SQLite has no RETURNING, batch rows are inserted one by one for their ids
+@pytest.mark.query_budget(max_queries=10, max_repeats=None)
+def test_post_movies_batch(client, auth):
+    post_data = {'movies': [
+        {'title': 'Back to the future 5', 'release_date': '2023-04-01',
+         'actors': [1, 2]},
+        {'title': 'Back to the future 6', 'release_date': '2024-04-01'}
+    ]}
+    res = client.post('/api/movies/batch', json=post_data, headers={
+        'Authorization': auth.bearer_token(UserRole.EXECUTIVE_PRODUCER)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert data['success'] is True
+    movie = Movie.query.get(data['results'][0]['id'])
+    assert movie.title == 'Back to the future 5'
+    assert movie.release_date.date() == date(2023, 4, 1)
+    assert set(actor.id for actor in movie.actors) == {1, 2}
+
+
+def test_post_movies_batch_invalid_date(client, auth):
+    post_data = {'movies': [
+        {'title': 'Back to the future 5', 'release_date': 'tomorrow'}
+    ]}
+    res = client.post('/api/movies/batch', json=post_data, headers={
+        'Authorization': auth.bearer_token(UserRole.EXECUTIVE_PRODUCER)})
+    data = res.get_json()
+    assert res.status_code == 422
+    assert 'error' in data['results'][0]
+    assert Movie.query.count() == 2
+
+
+def test_post_movies_batch_forbidden(client, auth):
+    post_data = {'movies': [
+        {'title': 'Back to the future 5', 'release_date': '2023-04-01'}
+    ]}
+    res = client.post('/api/movies/batch', json=post_data, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    assert res.status_code == 403
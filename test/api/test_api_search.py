@@ -0,0 +1,95 @@
+from jose import jwt
+
+from src.models import Actor, Gender
+from src.auth import Auth, UserRole
+
+
+def test_search(client, auth):
+    res = client.get('/api/search?q=back', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [(result['type'], result['id']) for result in data['results']] \
+        == [('movie', 1)]
+    assert data['results'][0]['title'] == 'Back to the future 4'
+    assert data['next_cursor'] is None
+
+
+def test_search_prefix_and_ranking(client, auth):
+    Actor('Joe Joe Smith', 40, Gender.MALE).insert()
+    res = client.get('/api/search?q=jo&type=actor', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 200
+    assert [result['name'] for result in data['results']] == \
+        ['Joe Joe Smith', 'Joe Gainwell']
+
+
+def test_search_follows_writes(client, auth):
+    res = client.patch('/api/actors/2', json={'name': 'Michelle Ortiz'},
+                       headers={'Authorization': auth.bearer_token(
+                           UserRole.CASTING_DIRECTOR)})
+    assert res.status_code == 200
+    client.delete('/api/actors/1', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    data = client.get('/api/search?q=ortiz', headers=headers).get_json()
+    assert [result['id'] for result in data['results']] == [2]
+    data = client.get('/api/search?q=ortega', headers=headers).get_json()
+    assert data['results'] == []
+    data = client.get('/api/search?q=joe', headers=headers).get_json()
+    assert data['results'] == []
+
+
+def test_search_paginated(client, auth):
+    client.post('/api/actors/batch', json={'actors': [
+        {'name': f'Back Actor {i}', 'age': 30, 'gender': 'male'}
+        for i in range(3)
+    ]}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    headers = {
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+    data = client.get('/api/search?q=back&limit=3',
+                      headers=headers).get_json()
+    assert len(data['results']) == 3
+    data = client.get(f"/api/search?q=back&limit=3"
+                      f"&cursor={data['next_cursor']}",
+                      headers=headers).get_json()
+    assert len(data['results']) == 1
+    assert data['next_cursor'] is None
+
+
+def test_search_requires_query(client, auth):
+    res = client.get('/api/search?q=%20', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    data = res.get_json()
+    assert res.status_code == 400
+    assert data['message'] == 'Search query is required'
+
+
+def test_search_invalid_type(client, auth):
+    res = client.get('/api/search?q=joe&type=director', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    assert res.status_code == 400
+
+
+def test_search_decodes_token_once(client, auth, monkeypatch):
+    decoded = []
+
+    def verify_decode_jwt(token):
+        decoded.append(token)
+        return jwt.get_unverified_claims(token)
+
+    monkeypatch.setattr(Auth, 'verify_decode_jwt', verify_decode_jwt)
+    res = client.get('/api/search?q=back', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    assert res.status_code == 200
+    assert len(decoded) == 1
+
+
+def test_search_requires_both_permissions(client, auth):
+    token = jwt.encode({'permissions': ['get:actors']}, 'key')
+    res = client.get('/api/search?q=back', headers={
+        'Authorization': f'Bearer {token}'})
+    assert res.status_code == 403
@@ -0,0 +1,132 @@
+import json
+import time
+import asyncio
+import threading
+
+from uvicorn.middleware.wsgi import WSGIMiddleware
+
+from src.asgi import Lifespan, create_asgi_app, wsgi_scope
+from src.auth import UserRole
+
+
+def call(adapter, method, path, headers=(), body=b'', query_string=b''):
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query_string,
+        'http_version': '1.1',
+        'server': ('127.0.0.1', 5000),
+        'headers': [(name.lower().encode(), value.encode())
+                    for name, value in headers]
+        + [(b'content-length', str(len(body)).encode())]
+    }
+    messages = [{'type': 'http.request', 'body': body}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(adapter(scope, receive, send))
+    start, *chunks = sent
+    return start, b''.join(chunk['body'] for chunk in chunks)
+
+
+def test_wsgi_scope():
+    scope = wsgi_scope({'server': ('127.0.0.1', 5000), 'headers': []})
+    assert scope['server'] == ('127.0.0.1', '5000')
+    assert wsgi_scope({'headers': []}) == {'headers': []}
+
+
+def test_get_actors(client, auth):
+    adapter = create_asgi_app(client.application, max_workers=2)
+    start, body = call(adapter, 'GET', '/api/actors', headers=[(
+        'Authorization', auth.bearer_token(UserRole.CASTING_ASSISTANT))],
+        query_string=b'fields=name')
+    assert start['status'] == 200
+    assert dict(start['headers'])[b'Content-Type'] == b'application/json'
+    assert [actor['name'] for actor in json.loads(body)['actors']] == [
+        'Joe Gainwell', 'Michelle Ortega']
+
+
+def test_post_actor(client, auth):
+    adapter = create_asgi_app(client.application, max_workers=2)
+    start, body = call(adapter, 'POST', '/api/actors', headers=[
+        ('Authorization', auth.bearer_token(UserRole.CASTING_DIRECTOR)),
+        ('Content-Type', 'application/json')], body=json.dumps({
+            'name': 'Ana Lopez', 'age': 31, 'gender': 'female'}).encode())
+    assert start['status'] == 200
+    assert json.loads(body)['actor_id'] == 3
+
+
+def test_error_response(client):
+    adapter = create_asgi_app(client.application, max_workers=2)
+    start, body = call(adapter, 'GET', '/api/actors')
+    assert start['status'] == 401
+    assert json.loads(body)['success'] is False
+
+
+def test_concurrency_bounded_by_workers():
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def app(environ, start_response):
+        with lock:
+            running[0] += 1
+            running[1] = max(running)
+        time.sleep(0.02)
+        with lock:
+            running[0] -= 1
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+
+    adapter = Lifespan(WSGIMiddleware(app, workers=2))
+
+    async def request():
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': b''}
+
+        async def send(message):
+            sent.append(message)
+
+        await adapter({'type': 'http', 'method': 'GET', 'path': '/',
+                       'query_string': b'', 'http_version': '1.1',
+                       'headers': []}, receive, send)
+        return sent
+
+    async def main():
+        return await asyncio.gather(*[request() for _ in range(8)])
+
+    responses = asyncio.run(main())
+    assert all(sent[-1]['body'] == b'' for sent in responses)
+    assert running[1] == 2
+
+
+def test_lifespan_refreshes_jwks(monkeypatch):
+    refreshed = threading.Event()
+    monkeypatch.setattr('src.asgi.jwks_store.refresh', refreshed.set)
+    adapter = Lifespan(None, jwks_refresh_interval=60)
+    messages = [{'type': 'lifespan.startup'}]
+    sent = []
+
+    async def receive():
+        while not messages:
+            await asyncio.sleep(0.01)
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message['type'])
+        if message['type'] == 'lifespan.startup.complete':
+            await asyncio.get_event_loop().run_in_executor(
+                None, refreshed.wait, 1)
+            messages.append({'type': 'lifespan.shutdown'})
+
+    asyncio.run(adapter({'type': 'lifespan'}, receive, send))
+    assert refreshed.is_set()
+    assert sent == ['lifespan.startup.complete',
+                    'lifespan.shutdown.complete']
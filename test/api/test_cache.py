@@ -0,0 +1,160 @@
+import time
+
+from jose import jwt
+from prometheus_client import REGISTRY
+
+from src.auth import UserRole
+from src.cache import entity_cache, MemoryBackend, SharedBackend
+from src.models import db, Actor, TableVersion
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in self.data if key.startswith(match[:-1])]
+
+
+def test_get_actor_served_from_cache(client, auth, queries):
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.CASTING_ASSISTANT)}
+    first = client.get('/api/actors/1', headers=headers).get_json()
+    del queries[:]
+    second = client.get('/api/actors/1?fields=name', headers=headers)
+    assert second.get_json() == {'name': first['name']}
+    assert not any('FROM actors' in statement for statement in queries)
+    assert entity_cache.stats()['hits'] == 1
+
+
+def test_get_actor_subset_not_cached(client, auth, queries):
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.CASTING_ASSISTANT)}
+    res = client.get('/api/actors/1?fields=name', headers=headers)
+    assert res.get_json() == {'name': 'Joe Gainwell'}
+    assert not any('movie_actors' in statement for statement in queries
+                   if 'table_versions' not in statement)
+    client.get('/api/actors/1', headers=headers)
+    assert entity_cache.stats()['hits'] == 0
+
+
+def test_get_actor_after_write_by_other_process(client, auth):
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.CASTING_ASSISTANT)}
+    first = client.get('/api/actors/1', headers=headers)
+    # Another worker renames the actor, its invalidation never reaches
+    # this process's cache.
+    db.session.query(Actor).filter(Actor.id == 1).update(
+        {Actor.name: 'Joseph Gainwell'}, synchronize_session=False)
+    db.session.query(TableVersion).filter(
+        TableVersion.table_name == 'actors').update(
+        {TableVersion.version: TableVersion.version + 1},
+        synchronize_session=False)
+    db.session.commit()
+    res = client.get('/api/actors/1', headers=dict(
+        headers, **{'If-None-Match': first.headers['ETag']}))
+    assert res.status_code == 200
+    assert res.get_json()['name'] == 'Joseph Gainwell'
+    res = client.get('/api/actors/1', headers=dict(
+        headers, **{'If-None-Match': res.headers['ETag']}))
+    assert res.status_code == 304
+
+
+def test_patch_movie_actors_invalidates_actors(client, auth):
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.EXECUTIVE_PRODUCER)}
+    for actor_id in (1, 2):
+        res = client.get(f'/api/actors/{actor_id}', headers=headers)
+        assert res.get_json()['movies'] == []
+    res = client.patch('/api/movies/1', json={'actors': [1, 2]},
+                       headers=headers)
+    assert res.status_code == 200
+    for actor_id in (1, 2):
+        res = client.get(f'/api/actors/{actor_id}', headers=headers)
+        assert res.get_json()['movies'] == [1]
+    res = client.patch('/api/movies/1', json={'remove_actors': [2]},
+                       headers=headers)
+    assert res.status_code == 200
+    res = client.get('/api/actors/2', headers=headers)
+    assert res.get_json()['movies'] == []
+
+
+def test_delete_actor_invalidates_actor_and_movies(client, auth):
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.EXECUTIVE_PRODUCER)}
+    client.patch('/api/movies/1', json={'actors': [1]}, headers=headers)
+    assert client.get('/api/movies/1', headers=headers).get_json()[
+        'actors'] == [1]
+    assert client.get('/api/actors/1', headers=headers).status_code == 200
+    client.delete('/api/actors/1', headers=headers)
+    assert client.get('/api/actors/1', headers=headers).status_code == 404
+    assert client.get('/api/movies/1', headers=headers).get_json()[
+        'actors'] == []
+
+
+def test_get_cache_stats(client, auth):
+    client.get('/api/actors/1', headers={'Authorization': auth.bearer_token(
+        UserRole.CASTING_ASSISTANT)})
+    token = jwt.encode({'permissions': ['get:status']}, 'key')
+    res = client.get('/api/status/caches', headers={
+        'Authorization': f'Bearer {token}'})
+    data = res.get_json()
+    assert data['entities']['backend'] == 'MemoryBackend'
+    assert data['entities']['misses'] == 1
+    assert 'hits' in data['tokens']
+
+
+def test_get_cache_stats_requires_auth(client):
+    assert client.get('/api/status/caches').status_code == 401
+
+
+def test_cache_metrics(client, auth):
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.CASTING_ASSISTANT)}
+
+    def sample(result):
+        return REGISTRY.get_sample_value('cache_requests_total', {
+            'cache': 'entities', 'result': result}) or 0
+
+    hits, misses = sample('hit'), sample('miss')
+    client.get('/api/actors/1', headers=headers)
+    client.get('/api/actors/1?fields=name', headers=headers)
+    assert (sample('hit'), sample('miss')) == (hits + 1, misses + 1)
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'cache_requests_total{cache="entities",result="hit"}' in text
+
+
+def test_memory_backend_expires_and_evicts():
+    backend = MemoryBackend(maxsize=2)
+    backend.set('a', 1, ttl=60)
+    backend.set('b', 2, ttl=0)
+    assert backend.get('b') is None
+    backend.set('c', 3, ttl=60)
+    backend.set('d', 4, ttl=60)
+    assert backend.get('a') is None
+    assert backend.get('d') == 4
+    assert backend.evictions == 1
+    backend.set('e', 5, ttl=0.01)
+    time.sleep(0.02)
+    assert backend.get('e') is None
+
+
+def test_shared_backend_round_trip():
+    backend = SharedBackend(FakeRedis())
+    backend.set('actors:1', {'id': 1, 'name': 'Joe'}, ttl=60)
+    assert backend.get('actors:1') == {'id': 1, 'name': 'Joe'}
+    backend.delete(['actors:1'])
+    assert backend.get('actors:1') is None
+    backend.set('actors:2', {'id': 2}, ttl=60)
+    backend.clear()
+    assert backend.get('actors:2') is None
@@ -0,0 +1,132 @@
+import json
+
+import pytest
+
+from src.auth import UserRole
+from src.models import (
+    db, Actor, Movie, StatCounter, TableVersion, movie_actors_table)
+
+
+@pytest.fixture
+def cli(client):
+    runner = client.application.test_cli_runner(mix_stderr=False)
+
+    def invoke(*args):
+        return runner.invoke(args=['catalog'] + [str(arg) for arg in args])
+    return invoke
+
+
+def write_lines(path, *lines):
+    path.write_text(''.join(line + '\n' for line in lines))
+    return path
+
+
+def test_export_actors_csv(cli, tmp_path):
+    res = cli('export', 'actors', tmp_path / 'actors.csv')
+    assert res.exit_code == 0, res.output
+    assert (tmp_path / 'actors.csv').read_text().splitlines() == [
+        'id,name,age,gender',
+        '1,Joe Gainwell,23,male',
+        '2,Michelle Ortega,19,female'
+    ]
+    assert 'actors: 2 rows done' in res.stderr
+
+
+def test_export_movies_ndjson(cli, tmp_path):
+    res = cli('export', 'movies', tmp_path / 'movies.ndjson')
+    assert res.exit_code == 0, res.output
+    rows = [json.loads(line) for line in
+            (tmp_path / 'movies.ndjson').read_text().splitlines()]
+    assert rows == [
+        {'id': 1, 'title': 'Back to the future 4',
+         'release_date': '2021-04-01T00:00:00'},
+        {'id': 2, 'title': 'A new bright sunshine',
+         'release_date': '2022-09-01T00:00:00'}
+    ]
+
+
+def test_import_actors_and_casts(cli, tmp_path):
+    actors = write_lines(tmp_path / 'actors.csv', 'id,name,age,gender',
+                         '10,Ana Lopez,31,female', '11,Raj Patel,45,male')
+    casts = write_lines(tmp_path / 'casts.ndjson',
+                        '{"movie_id": 1, "actor_id": 10}',
+                        '{"movie_id": 2, "actor_id": 10}',
+                        '{"movie_id": 2, "actor_id": 11}')
+    versions = TableVersion.current('actors', 'movie_actors')
+    assert cli('import', 'actors', actors).exit_code == 0
+    res = cli('import', 'movie_actors', casts, '--chunk-size', 2)
+    assert res.exit_code == 0, res.output
+    assert Actor.load_formatted(10) == {
+        'id': 10, 'name': 'Ana Lopez', 'age': 31, 'gender': 'female',
+        'movies': [1, 2]}
+    assert Movie.load_formatted(2)['actors'] == [10, 11]
+    current = TableVersion.current('actors', 'movie_actors')
+    assert current['actors'] == versions['actors'] + 1
+    assert current['movie_actors'] == versions['movie_actors'] + 2
+    assert StatCounter.current('actors_by_gender') == {
+        'male': 2, 'female': 2}
+    assert not (tmp_path / 'casts.ndjson.checkpoint').exists()
+
+
+def test_import_without_ids(cli, tmp_path):
+    movies = write_lines(tmp_path / 'movies.csv', 'title,release_date',
+                         'Dune,2021-10-22')
+    assert cli('import', 'movies', movies).exit_code == 0
+    assert Movie.load_formatted(3)['title'] == 'Dune'
+
+
+def test_import_invalidates_cached_entities(client, cli, auth, tmp_path):
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.CASTING_ASSISTANT)}
+    assert client.get('/api/actors/1', headers=headers).json['movies'] == []
+    casts = write_lines(tmp_path / 'casts.csv', 'movie_id,actor_id', '1,1')
+    assert cli('import', 'movie_actors', casts).exit_code == 0
+    assert client.get('/api/actors/1', headers=headers).json['movies'] == [1]
+
+
+def test_import_resumes_from_checkpoint(cli, tmp_path):
+    casts = write_lines(tmp_path / 'casts.csv', 'movie_id,actor_id',
+                        '1,1', '1,2', '2,1', '2,2')
+    # The first chunk committed but the process was killed before the
+    # checkpoint recorded it, and only the row before it was recorded.
+    db.session.execute(movie_actors_table.insert(), [
+        {'movie_id': 1, 'actor_id': 1}, {'movie_id': 1, 'actor_id': 2}])
+    db.session.commit()
+    (tmp_path / 'casts.csv.checkpoint').write_text(json.dumps(
+        {'table': 'movie_actors', 'rows': 1, 'chunk_size': 2}))
+    res = cli('import', 'movie_actors', casts, '--chunk-size', 2)
+    assert res.exit_code == 0, res.output
+    assert 'resuming after row 1' in res.stderr
+    assert sorted(db.session.execute(movie_actors_table.select())) == [
+        (1, 1), (1, 2), (2, 1), (2, 2)]
+
+
+def test_import_checkpoint_for_other_table(cli, tmp_path):
+    actors = write_lines(tmp_path / 'actors.csv', 'name,age,gender')
+    (tmp_path / 'actors.csv.checkpoint').write_text(json.dumps(
+        {'table': 'movies', 'rows': 1, 'chunk_size': 2}))
+    res = cli('import', 'actors', actors)
+    assert res.exit_code == 1
+    assert 'is a checkpoint for movies' in res.stderr
+    assert cli('import', 'actors', actors, '--restart').exit_code == 0
+
+
+@pytest.mark.parametrize('line, error', [
+    ('Ana,old,female', 'line 2: invalid literal for int()'),
+    ('Ana,31,other', "line 2: unknown gender 'other'"),
+    (',31,female', 'line 2: expected a non empty string'),
+])
+def test_import_invalid_row(cli, tmp_path, line, error):
+    actors = write_lines(tmp_path / 'actors.csv', 'name,age,gender', line)
+    res = cli('import', 'actors', actors)
+    assert res.exit_code == 1
+    assert error in res.stderr
+    assert Actor.query.count() == 2
+
+
+def test_import_missing_column(cli, tmp_path):
+    actors = write_lines(tmp_path / 'actors.ndjson',
+                         '{"name": "Ana", "age": 31}')
+    res = cli('import', 'actors', actors)
+    assert res.exit_code == 1
+    assert 'line 1: missing columns gender' in res.stderr
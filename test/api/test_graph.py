@@ -0,0 +1,147 @@
+from datetime import date
+
+import pytest
+
+from src.auth import UserRole
+from src.graph import CastGraph, build_csr
+from src.models import (
+    db, Actor, CastChange, Gender, Movie, TableVersion, movie_actors_table)
+
+
+@pytest.fixture
+def headers(auth):
+    return {'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+
+
+@pytest.fixture
+def cast(client):
+    # Joe (1) and Michelle (2) in movie 1, Michelle and Ana (3) in
+    # movies 1 and 2, Raj (4) on his own in movie 3.
+    Actor('Ana Lopez', 31, Gender.FEMALE).insert()
+    Actor('Raj Patel', 45, Gender.MALE).insert()
+    Movie('Dune', date(2021, 10, 22)).insert()
+    Movie.update_links(1, replace=[1, 2, 3])
+    Movie.update_links(2, replace=[2, 3])
+    Movie.update_links(3, replace=[4])
+    db.session.commit()
+
+
+def test_build_csr():
+    offsets, links = build_csr([(1, 10), (1, 11), (3, 12)])
+    assert list(offsets) == [0, 0, 2, 2, 3]
+    assert list(links) == [10, 11, 12]
+
+
+def test_get_costars(client, headers, cast):
+    res = client.get('/api/actors/2/costars', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json() == {
+        'costars': [
+            {'id': 3, 'name': 'Ana Lopez', 'shared_movies': 2},
+            {'id': 1, 'name': 'Joe Gainwell', 'shared_movies': 1}
+        ],
+        'next_cursor': None
+    }
+
+
+def test_get_costars_paginated(client, headers, cast):
+    data = client.get('/api/actors/2/costars?limit=1',
+                      headers=headers).get_json()
+    assert [costar['id'] for costar in data['costars']] == [3]
+    data = client.get('/api/actors/2/costars?limit=1&cursor='
+                      + data['next_cursor'], headers=headers).get_json()
+    assert [costar['id'] for costar in data['costars']] == [1]
+    assert data['next_cursor'] is None
+
+
+def test_get_costars_none(client, headers, cast):
+    res = client.get('/api/actors/4/costars', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json()['costars'] == []
+
+
+def test_get_costars_not_found(client, headers):
+    res = client.get('/api/actors/99/costars', headers=headers)
+    assert res.status_code == 404
+
+
+def test_get_actor_path(client, headers, cast):
+    res = client.get('/api/actors/1/path/3', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json() == {'degrees': 1, 'actors': [1, 3], 'movies': [1]}
+
+
+def test_get_actor_path_to_self(client, headers, cast):
+    res = client.get('/api/actors/1/path/1', headers=headers)
+    assert res.get_json() == {'degrees': 0, 'actors': [1], 'movies': []}
+
+
+def test_get_actor_path_not_connected(client, headers, cast):
+    res = client.get('/api/actors/1/path/4', headers=headers)
+    assert res.status_code == 404
+    assert res.get_json()['message'] == 'Actors are not connected'
+
+
+def test_get_actor_path_unknown_actor(client, headers, cast):
+    res = client.get('/api/actors/1/path/99', headers=headers)
+    assert res.status_code == 404
+    assert res.get_json()['message'] == 'Actor not found'
+
+
+def test_actor_path_follows_cast_changes(client, auth, headers, cast):
+    graph = client.application.extensions['cast_graph']
+    client.get('/api/actors/1/path/3', headers=headers)
+    actors = graph.actors
+    res = client.patch('/api/actors/4', json={'add_movies': [2]}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    assert res.status_code == 200
+    data = client.get('/api/actors/1/path/4', headers=headers).get_json()
+    assert data == {'degrees': 2, 'actors': [1, 2, 4], 'movies': [1, 2]}
+    # Patched in place rather than rebuilt.
+    assert graph.actors is actors
+    assert set(graph.actors.patched) == {4}
+
+
+def test_actor_path_rebuilds_after_external_changes(client, headers, cast):
+    graph = client.application.extensions['cast_graph']
+    client.get('/api/actors/1/path/3', headers=headers)
+    actors = graph.actors
+    # Another process links Raj to movie 1 and bumps the version without
+    # logging the change.
+    db.session.execute(movie_actors_table.insert(),
+                       {'movie_id': 1, 'actor_id': 4})
+    db.session.query(TableVersion).filter(
+        TableVersion.table_name == 'movie_actors').update(
+        {TableVersion.version: TableVersion.version + 1},
+        synchronize_session=False)
+    db.session.commit()
+    data = client.get('/api/actors/1/path/4', headers=headers).get_json()
+    assert data == {'degrees': 1, 'actors': [1, 4], 'movies': [1]}
+    assert graph.actors is not actors
+
+
+def test_actor_path_patches_changes_from_other_processes(
+        client, auth, headers, cast):
+    # A graph built in another worker, which did not see the write.
+    other = CastGraph()
+    actors, _ = other.refresh()
+    res = client.patch('/api/actors/4', json={'add_movies': [2]}, headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+    assert res.status_code == 200
+    version = TableVersion.current('movie_actors')['movie_actors']
+    assert sorted((row.table_name, row.row_id) for row in
+                  CastChange.query.filter_by(version=version)) == [
+        ('actors', 4), ('movies', 2)]
+    assert other.shortest_path(1, 4) == ([1, 2, 4], [1, 2])
+    assert other.actors is actors
+    assert set(other.actors.patched) == {4}
+    assert set(other.movies.patched) == {2}
+
+
+def test_change_log_pruned(client, auth, cast, monkeypatch):
+    monkeypatch.setattr('src.graph.CHANGE_LOG_VERSIONS', 1)
+    headers = {'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)}
+    client.patch('/api/actors/4', json={'add_movies': [2]}, headers=headers)
+    client.patch('/api/actors/1', json={'add_movies': [3]}, headers=headers)
+    version = TableVersion.current('movie_actors')['movie_actors']
+    assert set(row.version for row in CastChange.query) == {version}
@@ -0,0 +1,82 @@
+import os
+import json
+import time
+
+import pytest
+
+from src.auth import Auth
+from src.jwks import JWKSKeyStore, JWKSError, jwks_store
+from test.conftest import FIXTURES_DIR, KID, rs256_token
+
+
+@pytest.fixture
+def jwks_file(tmp_path):
+    path = tmp_path / 'jwks.json'
+    with open(os.path.join(FIXTURES_DIR, 'jwks.json')) as f:
+        path.write_text(f.read())
+    return path
+
+
+def test_get_key_parses_keys_once(jwks_file, monkeypatch):
+    monkeypatch.setenv('AUTH0_JWKS_URL', str(jwks_file))
+    store = JWKSKeyStore(ttl=60, min_refresh_interval=0)
+    loads = []
+    load = store._load
+    monkeypatch.setattr(store, '_load',
+                        lambda source: loads.append(source) or load(source))
+    assert store.get_key(KID) is not None
+    assert store.get_key(KID) is not None
+    assert len(loads) == 1
+
+
+def test_get_key_refetches_unknown_kid(jwks_file, monkeypatch):
+    monkeypatch.setenv('AUTH0_JWKS_URL', str(jwks_file))
+    store = JWKSKeyStore(ttl=60, min_refresh_interval=0)
+    assert store.get_key('rotated') is None
+    jwks = json.loads(jwks_file.read_text())
+    jwks['keys'][0]['kid'] = 'rotated'
+    jwks_file.write_text(json.dumps(jwks))
+    assert store.get_key('rotated') is not None
+
+
+def test_get_key_unknown_kid_refetch_is_rate_limited(jwks_file, monkeypatch):
+    monkeypatch.setenv('AUTH0_JWKS_URL', str(jwks_file))
+    store = JWKSKeyStore(ttl=60, min_refresh_interval=60)
+    assert store.get_key(KID) is not None
+    jwks_file.write_text(json.dumps({'keys': []}))
+    assert store.get_key('other') is None
+    assert store.get_key(KID) is not None
+
+
+def test_get_key_serves_stale_keys_when_fetch_fails(jwks_file, monkeypatch):
+    monkeypatch.setenv('AUTH0_JWKS_URL', str(jwks_file))
+    store = JWKSKeyStore(ttl=0, min_refresh_interval=0)
+    assert store.get_key(KID) is not None
+    jwks_file.unlink()
+    time.sleep(0.01)
+    assert store.get_key(KID) is not None
+
+
+def test_get_key_raises_without_any_keys(tmp_path, monkeypatch):
+    monkeypatch.setenv('AUTH0_JWKS_URL', str(tmp_path / 'missing.json'))
+    store = JWKSKeyStore(ttl=60, min_refresh_interval=0)
+    with pytest.raises(JWKSError):
+        store.get_key(KID)
+
+
+def test_get_key_accepts_file_url(jwks_file, monkeypatch):
+    monkeypatch.setenv('AUTH0_JWKS_URL', jwks_file.as_uri())
+    store = JWKSKeyStore()
+    assert store.get_key(KID) is not None
+
+
+def test_verify_decode_jwt_with_local_jwks(client):
+    jwks_store.clear()
+    claims = {
+        'iss': f"https://{os.environ['AUTH0_DOMAIN']}/",
+        'aud': os.environ['API_AUDIENCE'],
+        'exp': int(time.time()) + 60,
+        'permissions': ['get:actors']
+    }
+    payload = Auth.verify_decode_jwt(rs256_token(claims))
+    assert 'get:actors' in payload['permissions']
@@ -0,0 +1,45 @@
+import os
+import time
+
+import pytest
+
+from src.auth import Auth
+from src.jwks import jwks_store
+from src.token_cache import token_cache
+from src import jwt_backend
+from test.conftest import rs256_token
+
+
+@pytest.fixture(params=jwt_backend.available_backends())
+def backend(request):
+    name = jwt_backend.select_backend(request.param)
+    jwks_store.clear()
+    token_cache.clear()
+    yield name
+    jwt_backend.select_backend()
+    jwks_store.clear()
+
+
+def test_select_backend_auto_prefers_native(monkeypatch):
+    monkeypatch.setenv('JWT_CRYPTO_BACKEND', 'auto')
+    assert jwt_backend.select_backend() == \
+        jwt_backend.available_backends()[0]
+    assert jwt_backend.current_backend() == \
+        jwt_backend.available_backends()[0]
+
+
+def test_select_backend_unknown():
+    with pytest.raises(ValueError):
+        jwt_backend.select_backend('openssl3000')
+
+
+def test_verify_decode_jwt_with_backend(client, backend):
+    claims = {
+        'iss': f"https://{os.environ['AUTH0_DOMAIN']}/",
+        'aud': os.environ['API_AUDIENCE'],
+        'exp': int(time.time()) + 60,
+        'permissions': ['get:actors']
+    }
+    payload = Auth.verify_decode_jwt(rs256_token(claims))
+    assert 'get:actors' in payload['permissions']
+    assert jwt_backend.current_backend() == backend
@@ -0,0 +1,61 @@
+import os
+import time
+
+from prometheus_client import REGISTRY
+
+from src.auth import UserRole
+from src.token_cache import token_cache
+from test.conftest import rs256_token
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+def test_request_metrics(client, auth):
+    labels = {'blueprint': 'api_actors', 'endpoint': 'api_actors.get_actor',
+              'method': 'GET'}
+    ok = sample('http_requests_total', status='200', **labels)
+    missing = sample('http_requests_total', status='404', **labels)
+    observed = sample('http_request_duration_seconds_count', **labels)
+    queries = sample('db_query_duration_seconds_count',
+                     blueprint='api_actors',
+                     endpoint='api_actors.get_actor')
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.CASTING_ASSISTANT)}
+    client.get('/api/actors/1', headers=headers)
+    client.get('/api/actors/99', headers=headers)
+    assert sample('http_requests_total', status='200', **labels) == ok + 1
+    assert sample('http_requests_total', status='404',
+                  **labels) == missing + 1
+    assert sample('http_request_duration_seconds_count',
+                  **labels) == observed + 2
+    assert sample('db_query_duration_seconds_count',
+                  blueprint='api_actors',
+                  endpoint='api_actors.get_actor') > queries
+
+
+def test_auth_metrics(client):
+    token_cache.clear()
+    jwks = sample('auth_duration_seconds_count', stage='jwks')
+    decode = sample('auth_duration_seconds_count', stage='decode')
+    res = client.get('/api/actors', headers={
+        'Authorization': 'Bearer ' + rs256_token({
+            'iss': f"https://{os.environ['AUTH0_DOMAIN']}/",
+            'aud': os.environ['API_AUDIENCE'],
+            'exp': int(time.time()) + 60,
+            'permissions': ['get:actors']
+        })})
+    assert res.status_code == 200
+    assert sample('auth_duration_seconds_count', stage='jwks') == jwks + 1
+    assert sample('auth_duration_seconds_count',
+                  stage='decode') == decode + 1
+
+
+def test_get_metrics(client):
+    client.get('/api')
+    res = client.get('/metrics')
+    assert res.status_code == 200
+    assert res.content_type.startswith('text/plain')
+    assert (b'http_requests_total{blueprint="",endpoint="index",'
+            b'method="GET",status="200"}') in res.data
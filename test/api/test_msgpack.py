@@ -0,0 +1,82 @@
+import msgpack
+
+from src.models import Actor, Movie
+from src.auth import UserRole
+
+
+MSGPACK = 'application/msgpack'
+
+
+def headers(auth, role=UserRole.CASTING_ASSISTANT, **extra):
+    return dict({'Authorization': auth.bearer_token(role)}, **extra)
+
+
+def test_get_actors_msgpack(client, auth):
+    res = client.get('/api/actors', headers=headers(auth, Accept=MSGPACK))
+    assert res.status_code == 200
+    assert res.content_type == MSGPACK
+    assert 'Accept' in res.headers['Vary']
+    json_res = client.get('/api/actors', headers=headers(auth))
+    assert msgpack.unpackb(res.data, raw=False) == json_res.get_json()
+
+
+def test_get_movie_msgpack_dates(client, auth):
+    res = client.get('/api/movies/1', headers=headers(auth, Accept=MSGPACK))
+    data = msgpack.unpackb(res.data, raw=False)
+    assert data['release_date'] == '2021-04-01T00:00:00'
+
+
+def test_json_stays_default(client, auth):
+    res = client.get('/api/actors', headers=headers(
+        auth, Accept='*/*'))
+    assert res.content_type == 'application/json'
+    res = client.get('/api/actors', headers=headers(
+        auth, Accept=f'application/json, {MSGPACK}'))
+    assert res.content_type == 'application/json'
+
+
+def test_etag_per_representation(client, auth):
+    json_res = client.get('/api/movies', headers=headers(auth))
+    res = client.get('/api/movies', headers=headers(
+        auth, Accept=MSGPACK, **{'If-None-Match': json_res.headers['ETag']}))
+    assert res.status_code == 200
+    res = client.get('/api/movies', headers=headers(
+        auth, Accept=MSGPACK, **{'If-None-Match': res.headers['ETag']}))
+    assert res.status_code == 304
+    assert 'Accept' in res.headers['Vary']
+
+
+def test_post_actor_msgpack(client, auth):
+    res = client.post('/api/actors', data=msgpack.packb({
+        'name': 'Ana Lopez', 'age': 31, 'gender': 'female', 'movies': [1]
+    }), headers=headers(auth, UserRole.CASTING_DIRECTOR,
+                        Accept=MSGPACK, **{'Content-Type': MSGPACK}))
+    assert res.status_code == 200
+    data = msgpack.unpackb(res.data, raw=False)
+    actor = Actor.query.get(data['actor_id'])
+    assert actor.name == 'Ana Lopez'
+    assert [movie.id for movie in actor.movies] == [1]
+
+
+def test_patch_movie_msgpack(client, auth):
+    res = client.patch('/api/movies/1', data=msgpack.packb({
+        'title': 'Back to the future: part IV', 'actors': [2]
+    }), headers=headers(auth, UserRole.CASTING_DIRECTOR,
+                        **{'Content-Type': MSGPACK}))
+    assert res.status_code == 200
+    movie = Movie.query.get(1)
+    assert movie.title == 'Back to the future: part IV'
+    assert [actor.id for actor in movie.actors] == [2]
+
+
+def test_invalid_msgpack_body(client, auth):
+    res = client.post('/api/actors', data=b'\xc1', headers=headers(
+        auth, UserRole.CASTING_DIRECTOR, **{'Content-Type': MSGPACK}))
+    assert res.status_code == 400
+    assert res.get_json()['message'] == 'Failed to decode MessagePack body'
+
+
+def test_error_msgpack(client):
+    res = client.get('/api/actors/1', headers={'Accept': MSGPACK})
+    assert res.status_code == 401
+    assert msgpack.unpackb(res.data, raw=False)['success'] is False
@@ -0,0 +1,90 @@
+import pytest
+from jose import jwt
+from prometheus_client import REGISTRY
+from sqlalchemy import create_engine, exc
+
+from src.pool import (
+    InstrumentedQueuePool, engine_options, pool_label, pool_stats)
+
+
+def test_engine_options_postgres(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '20')
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '0')
+    monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+    monkeypatch.setenv('DB_STATEMENT_TIMEOUT', '5000')
+    monkeypatch.setenv('DB_IDLE_IN_TRANSACTION_TIMEOUT', '10000')
+    options = engine_options('postgres://user:secret@db/casting')
+    assert options['poolclass'] is InstrumentedQueuePool
+    assert options['pool_size'] == 20
+    assert options['max_overflow'] == 0
+    assert options['pool_pre_ping'] is False
+    assert options['pool_recycle'] == 1800
+    assert options['connect_args'] == {'options': (
+        '-c statement_timeout=5000 '
+        '-c idle_in_transaction_session_timeout=10000')}
+
+
+def test_engine_options_sqlite():
+    assert engine_options('sqlite:///:memory:') == {}
+
+
+def test_instrumented_pool_stats(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db',
+                           poolclass=InstrumentedQueuePool, pool_size=1,
+                           max_overflow=0, pool_timeout=0.01)
+    conn = engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    stats = pool_stats(engine)
+    assert stats['pool'] == 'InstrumentedQueuePool'
+    assert stats['checked_out'] == 1
+    assert stats['checkouts'] == 2
+    assert stats['timeouts'] == 1
+    assert stats['wait_time_max_ms'] >= 10
+    conn.close()
+    assert pool_stats(engine)['checked_in'] == 1
+    engine.dispose()
+
+
+def test_instrumented_pool_metrics(tmp_path):
+    engine = create_engine(f'sqlite:///{tmp_path}/pool.db',
+                           poolclass=InstrumentedQueuePool, pool_size=1,
+                           max_overflow=0, pool_timeout=0.01)
+    engine.pool.database = 'metrics-test'
+    labels = {'database': 'metrics-test'}
+
+    def sample(name):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    checkouts = sample('db_pool_checkouts_total')
+    conn = engine.connect()
+    assert sample('db_pool_checked_out') == 1
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    assert sample('db_pool_checkouts_total') == checkouts + 2
+    assert sample('db_pool_timeouts_total') >= 1
+    assert sample('db_pool_wait_seconds_count') >= 2
+    conn.close()
+    assert sample('db_pool_checked_out') == 0
+    engine.dispose()
+
+
+def test_pool_label():
+    assert pool_label('postgres://user:secret@db:5432/casting') == \
+        'db/casting'
+
+
+def test_get_pool_stats(client, auth):
+    token = jwt.encode({'permissions': ['get:status']}, 'key')
+    res = client.get('/api/status/pool', headers={
+        'Authorization': f'Bearer {token}'})
+    assert res.status_code == 200
+    assert res.get_json()['pool'] == 'StaticPool'
+
+
+def test_get_pool_stats_requires_permission(client, auth):
+    assert client.get('/api/status/pool').status_code == 401
+    token = jwt.encode({'permissions': ['get:actors']}, 'key')
+    res = client.get('/api/status/pool', headers={
+        'Authorization': f'Bearer {token}'})
+    assert res.status_code == 403
@@ -0,0 +1,149 @@
+import time
+import shutil
+
+import pytest
+from flask import g
+from sqlalchemy import exc
+
+from src.app import create_app
+from src.auth import UserRole
+from src.models import db, Actor
+from src.replicas import ReplicaSet
+from test.conftest import seed_db
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    apps = []
+
+    def setup(*replicas, strategy='round_robin'):
+        primary = tmp_path / 'primary.db'
+        monkeypatch.setenv('DATABASE_URL', f'sqlite:///{primary}')
+        monkeypatch.setenv('DATABASE_REPLICA_URLS', ','.join(
+            f'sqlite:///{tmp_path / replica}' for replica in replicas))
+        monkeypatch.setenv('DATABASE_REPLICA_STRATEGY', strategy)
+        app = create_app()
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all(bind=None)
+            seed_db()
+        for replica in replicas:
+            if (tmp_path / replica).parent.exists():
+                shutil.copy(primary, tmp_path / replica)
+        apps.append(app)
+        return app
+    yield setup
+    for app in apps:
+        app.extensions['replicas'].stop()
+
+
+def rename_actor(app, name, actor_id=1):
+    with app.app_context():
+        actor = Actor.query.get(actor_id)
+        actor.name = name
+        actor.update()
+
+
+def actor_names(client, auth):
+    res = client.get('/api/actors?fields=name', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    return [actor['name'] for actor in res.get_json()['actors']]
+
+
+def test_reads_go_to_replica(databases, auth):
+    app = databases('replica.db')
+    rename_actor(app, 'Primary Only')
+    with app.test_client() as client:
+        assert actor_names(client, auth)[0] == 'Joe Gainwell'
+        res = client.patch('/api/actors/1', json={'age': 30}, headers={
+            'Authorization': auth.bearer_token(UserRole.CASTING_DIRECTOR)})
+        assert res.status_code == 200
+    with app.app_context():
+        actor = Actor.query.get(1)
+        assert (actor.name, actor.age) == ('Primary Only', 30)
+
+
+def test_reads_round_robin(databases, auth):
+    app = databases('replica_a.db', 'replica_b.db')
+    with app.app_context():
+        for bind, name in (('replica_0', 'a'), ('replica_1', 'b')):
+            db.get_engine(app, bind=bind).execute(
+                Actor.__table__.update().where(Actor.id == 1).values(
+                    name=name))
+    with app.test_client() as client:
+        names = [actor_names(client, auth)[0] for _ in range(4)]
+    assert names == ['a', 'b', 'a', 'b']
+
+
+def test_falls_back_to_primary(databases, auth):
+    app = databases('missing/replica.db')
+    rename_actor(app, 'Primary Only')
+    with app.test_client() as client:
+        assert actor_names(client, auth)[0] == 'Primary Only'
+
+
+def test_read_after_write_uses_primary(databases):
+    app = databases('replica.db')
+    with app.test_request_context():
+        g.read_only = True
+        assert Actor.query.get(1).name == 'Joe Gainwell'
+        Actor.query.get(2).name = 'Written'
+        db.session.flush()
+        assert Actor.query.filter_by(name='Written').count() == 1
+        db.session.rollback()
+
+
+def test_least_connections_strategy():
+    class Pool:
+        def __init__(self, checked_out):
+            self.checkedout = lambda: checked_out
+
+    class Engine:
+        def __init__(self, checked_out):
+            self.pool = Pool(checked_out)
+
+        def connect(self):
+            raise NotImplementedError
+
+    engines = {'replica_0': Engine(3), 'replica_1': Engine(1)}
+    replicas = ReplicaSet(engines, 'least_connections')
+    replicas.watch = lambda get_engine: None
+    replicas.healthy = lambda name: True
+    assert replicas.choose(engines.get) is engines['replica_1']
+
+
+def test_health_checked_in_background():
+    class Engine:
+        up = True
+        connects = 0
+
+        def connect(self):
+            self.connects += 1
+            if not self.up:
+                raise exc.OperationalError('SELECT 1', {}, None)
+            return Connection()
+
+    class Connection:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+        def execute(self, statement):
+            pass
+
+    engine = Engine()
+    replicas = ReplicaSet(['replica_0'], check_interval=0.01)
+    try:
+        assert replicas.choose(lambda name: engine) is engine
+        engine.up = False
+        deadline = time.monotonic() + 5
+        while replicas.healthy('replica_0') and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        replicas.stop()
+    # Choosing only reads the last result.
+    connects = engine.connects
+    assert replicas.choose(lambda name: engine) is None
+    assert engine.connects == connects
@@ -0,0 +1,59 @@
+import json
+from datetime import date, datetime, timezone
+
+import pytest
+
+from src import serialization
+from src.auth import UserRole
+
+
+@pytest.fixture(params=serialization.available_json_backends())
+def backend(request):
+    previous = serialization.current_json_backend()
+    serialization.select_json_backend(request.param)
+    yield request.param
+    serialization.select_json_backend(previous)
+
+
+def test_dumps_dates_as_iso(backend):
+    data = serialization.dumps({
+        'naive': datetime(2021, 4, 1),
+        'aware': datetime(2021, 4, 1, 12, 30, tzinfo=timezone.utc),
+        'date': date(2021, 4, 1),
+        'ids': frozenset([3, 1, 2])
+    }, sort_keys=True)
+    assert data == (b'{"aware":"2021-04-01T12:30:00+00:00",'
+                    b'"date":"2021-04-01","ids":[1,2,3],'
+                    b'"naive":"2021-04-01T00:00:00"}')
+
+
+def test_dumps_rejects_unknown_types(backend):
+    with pytest.raises(TypeError):
+        serialization.dumps({'value': object()})
+
+
+def test_unsupported_backend():
+    with pytest.raises(ValueError):
+        serialization.select_json_backend('simplejson')
+
+
+def test_get_movie_release_date_iso(client, auth, backend):
+    res = client.get('/api/movies/1', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    assert res.content_type == 'application/json'
+    assert res.get_json()['release_date'] == '2021-04-01T00:00:00'
+
+
+def test_stream_movies_release_date_iso(client, auth, backend):
+    res = client.get('/api/movies?stream=ndjson', headers={
+        'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    movies = [json.loads(line) for line in res.data.splitlines()]
+    assert [movie['release_date'] for movie in movies] == [
+        '2021-04-01T00:00:00', '2022-09-01T00:00:00']
+
+
+def test_error_response(client, backend):
+    res = client.get('/api/movies/1')
+    assert res.status_code == 401
+    assert res.content_type == 'application/json'
+    assert res.get_json()['success'] is False
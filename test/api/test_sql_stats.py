@@ -0,0 +1,48 @@
+import logging
+
+import pytest
+
+from src.auth import UserRole
+from test.conftest import check_query_budget, statement_shape
+
+
+def test_server_timing_in_debug(client, auth):
+    headers = {'Authorization': auth.bearer_token(
+        UserRole.CASTING_ASSISTANT)}
+    assert 'Server-Timing' not in client.get(
+        '/api/actors', headers=headers).headers
+    client.application.debug = True
+    res = client.get('/api/actors', headers=headers)
+    assert res.headers['Server-Timing'].startswith('db;dur=')
+    assert 'desc="3 queries"' in res.headers['Server-Timing']
+
+
+def test_request_log_fields(client, auth, caplog):
+    with caplog.at_level(logging.INFO, logger='src.metrics'):
+        client.get('/api/actors/1', headers={
+            'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)})
+    record = caplog.records[-1]
+    assert record.path == '/api/actors/1'
+    assert record.status == 200
+    assert record.db_queries == 3
+    assert record.db_slowest_statement.startswith('SELECT')
+    assert 'db_queries=3' in record.getMessage()
+
+
+def test_statement_shape():
+    assert statement_shape(
+        'SELECT id FROM actors\nWHERE id IN (?, ?, ?) AND age > ?') == (
+        'SELECT id FROM actors WHERE id IN (?) AND age > ?')
+
+
+def test_query_budget_exceeded():
+    with pytest.raises(pytest.fail.Exception, match='ran 3 queries'):
+        check_query_budget(['SELECT 1', 'SELECT 2', 'SELECT 3'], 'GET /',
+                           max_queries=2)
+
+
+def test_query_budget_repeated_statement():
+    statements = ['SELECT * FROM movies WHERE id = ?'] * 2
+    check_query_budget(statements, 'GET /', max_repeats=2)
+    with pytest.raises(pytest.fail.Exception, match='N\\+1'):
+        check_query_budget(statements, 'GET /')
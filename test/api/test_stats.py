@@ -0,0 +1,96 @@
+import pytest
+
+from src.auth import UserRole
+from src.models import db, Actor, Movie, StatCounter, count_stats
+
+
+@pytest.fixture
+def headers(auth):
+    return {'Authorization': auth.bearer_token(UserRole.CASTING_ASSISTANT)}
+
+
+@pytest.fixture
+def director(auth):
+    return {'Authorization': auth.bearer_token(
+        UserRole.EXECUTIVE_PRODUCER)}
+
+
+def assert_counters_match_tables():
+    counts = count_stats(db.session.connection(), (Actor, Movie))
+    assert {counter: count for counter, count in counts.items() if count} \
+        == {(row.name, row.key): row.count
+            for row in StatCounter.query if row.count}
+
+
+@pytest.mark.query_budget(max_queries=2)
+def test_get_genders(client, headers):
+    res = client.get('/api/stats/genders', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json() == {'genders': {'male': 1, 'female': 1}}
+
+
+@pytest.mark.query_budget(max_queries=2)
+def test_get_release_years(client, headers):
+    res = client.get('/api/stats/release-years', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json() == {'years': [
+        {'year': 2021, 'movies': 1}, {'year': 2022, 'movies': 1}]}
+
+
+def test_counters_follow_writes(client, headers, director):
+    client.patch('/api/actors/1', json={'gender': 'female'},
+                 headers=director)
+    client.patch('/api/movies/2', json={'release_date': '2021-12-24'},
+                 headers=director)
+    client.post('/api/actors/batch', json={'actors': [
+        {'name': 'Tom Mcdowell', 'age': 72, 'gender': 'male'},
+        {'name': 'Lisa Mcdowell', 'age': 70, 'gender': 'female'}
+    ]}, headers=director)
+    client.post('/api/movies', json={
+        'title': 'Dune', 'release_date': '2021-10-22'}, headers=director)
+    client.delete('/api/actors/2', headers=director)
+    data = client.get('/api/stats/genders', headers=headers).get_json()
+    assert data == {'genders': {'male': 1, 'female': 2}}
+    data = client.get('/api/stats/release-years', headers=headers).get_json()
+    assert data == {'years': [{'year': 2021, 'movies': 3}]}
+    assert_counters_match_tables()
+
+
+def test_counters_unchanged_by_failed_write(client, headers, director):
+    res = client.patch('/api/actors/1', json={'gender': 'unknown'},
+                       headers=director)
+    assert res.status_code == 422
+    client.patch('/api/actors/2', json={'age': 20}, headers=director)
+    data = client.get('/api/stats/genders', headers=headers).get_json()
+    assert data == {'genders': {'male': 1, 'female': 1}}
+    assert_counters_match_tables()
+
+
+def test_get_cast_sizes(client, headers, director):
+    client.patch('/api/movies/2', json={'actors': [1, 2]}, headers=director)
+    res = client.get('/api/stats/cast-sizes?limit=1', headers=headers)
+    data = res.get_json()
+    assert res.status_code == 200
+    assert data['movies'] == [
+        {'id': 1, 'title': 'Back to the future 4', 'cast_size': 0}]
+    data = client.get('/api/stats/cast-sizes?limit=1&cursor='
+                      + data['next_cursor'], headers=headers).get_json()
+    assert data == {'movies': [
+        {'id': 2, 'title': 'A new bright sunshine', 'cast_size': 2}],
+        'next_cursor': None}
+
+
+def test_get_movie_counts(client, headers, director):
+    client.patch('/api/actors/2', json={'movies': [1, 2]}, headers=director)
+    res = client.get('/api/stats/movie-counts', headers=headers)
+    assert res.status_code == 200
+    assert res.get_json() == {'actors': [
+        {'id': 1, 'name': 'Joe Gainwell', 'movies': 0},
+        {'id': 2, 'name': 'Michelle Ortega', 'movies': 2}
+    ], 'next_cursor': None}
+
+
+def test_stats_require_permission(client, auth):
+    res = client.get('/api/stats/genders', headers={
+        'Authorization': auth.bearer_token(None)})
+    assert res.status_code == 403
@@ -0,0 +1,58 @@
+import os
+import time
+
+from jose import jwt
+
+from src.auth import Auth
+from src.jwks import jwks_store
+from src.token_cache import TokenCache, token_cache
+from test.conftest import rs256_token
+
+
+def test_token_cache_hit_until_exp():
+    cache = TokenCache(maxsize=10)
+    payload = {'exp': time.time() + 60}
+    cache.set('token', payload)
+    assert cache.get('token') is payload
+    assert cache.get('other') is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 1
+
+
+def test_token_cache_skips_expired_tokens():
+    cache = TokenCache(maxsize=10)
+    cache.set('token', {'exp': time.time() - 1})
+    assert cache.get('token') is None
+    cache.set('no-exp', {})
+    assert cache.stats()['size'] == 0
+
+
+def test_token_cache_evicts_least_recently_used():
+    cache = TokenCache(maxsize=2)
+    exp = time.time() + 60
+    cache.set('a', {'exp': exp})
+    cache.set('b', {'exp': exp})
+    cache.get('a')
+    cache.set('c', {'exp': exp})
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.get('c') is not None
+    assert cache.stats()['evictions'] == 1
+
+
+def test_verify_decode_jwt_caches_verified_token(client, monkeypatch):
+    jwks_store.clear()
+    token_cache.clear()
+    claims = {
+        'iss': f"https://{os.environ['AUTH0_DOMAIN']}/",
+        'aud': os.environ['API_AUDIENCE'],
+        'exp': int(time.time()) + 60,
+        'permissions': ['get:actors']
+    }
+    token = rs256_token(claims)
+    payload = Auth.verify_decode_jwt(token)
+    assert payload['permissions'] == frozenset(['get:actors'])
+    monkeypatch.setattr(jwt, 'decode', None)
+    assert Auth.verify_decode_jwt(token) is payload
+    assert token_cache.stats()['hits'] == 1
+    assert token_cache.stats()['misses'] == 1
@@ -1,7 +1,10 @@
 import os
+import re
+from collections import Counter
 from datetime import date
 
 from jose import jwt
+from sqlalchemy import event
 import pytest
 
 from src.app import create_app
@@ -9,6 +12,17 @@ from src.models import db, Actor, Gender, Movie
 from src.auth import Auth, UserRole
 
 
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+KID = '82iulBJoaXnwGRRJxUbRX'
+
+
+def rs256_token(claims, kid=KID):
+    with open(os.path.join(FIXTURES_DIR, 'jwks_private_key.pem')) as f:
+        private_key = f.read()
+    return jwt.encode(claims, private_key, algorithm='RS256',
+                      headers={'kid': kid})
+
+
 def seed_db():
     Actor('Joe Gainwell', 23, Gender.MALE).insert()
     Actor('Michelle Ortega', 19, Gender.FEMALE).insert()
@@ -21,6 +35,7 @@ def env():
     os.environ['AUTH0_DOMAIN'] = 'ufs-casting-agency.us.auth0.com'
     os.environ['API_AUDIENCE'] = 'https://ufs-casting-agency.herokuapp.com/api'
     os.environ['ALGORITHMS'] = 'RS256'
+    os.environ['AUTH0_JWKS_URL'] = os.path.join(FIXTURES_DIR, 'jwks.json')
     os.environ['DATABASE_URL'] = 'sqlite:///:memory:'
     os.environ['PORT'] = '5000'
 
@@ -36,6 +51,74 @@ def client():
             yield client
 
 
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'query_budget(max_queries=None, max_repeats=1): fail when '
+        'a request through the test client runs more than max_queries '
+        'statements, or the same statement shape more than max_repeats '
+        'times (None disables either check)')
+
+
+def statement_shape(statement):
+    # Expanded IN lists differ only in their number of placeholders.
+    return re.sub(r'\(\?(?:, \?)*\)', '(?)', ' '.join(statement.split()))
+
+
+def check_query_budget(statements, description, max_queries=None,
+                       max_repeats=1):
+    if max_queries is not None and len(statements) > max_queries:
+        pytest.fail(f'{description} ran {len(statements)} queries, the '
+                    f'budget is {max_queries}:\n' + '\n'.join(statements),
+                    pytrace=False)
+    if max_repeats is not None:
+        shape, repeats = Counter(map(statement_shape, statements)).most_common(
+            1)[0] if statements else (None, 0)
+        if repeats > max_repeats:
+            pytest.fail(f'{description} ran the same statement {repeats} '
+                        f'times (N+1 query?):\n{shape}', pytrace=False)
+
+
+@pytest.fixture(autouse=True)
+def query_budget(request):
+    marker = request.node.get_closest_marker('query_budget')
+    if marker is None or 'client' not in request.fixturenames:
+        yield
+        return
+    client = request.getfixturevalue('client')
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    def open_checked(*args, **kwargs):
+        del statements[:]
+        response = open_unchecked(*args, **kwargs)
+        path = args[0] if args else kwargs.get('path', '/')
+        check_query_budget(
+            statements, f"{kwargs.get('method', 'GET')} {path}",
+            *marker.args, **marker.kwargs)
+        return response
+
+    open_unchecked = client.open
+    client.open = open_checked
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield
+    event.remove(db.engine, 'before_cursor_execute', record)
+    client.open = open_unchecked
+
+
+@pytest.fixture
+def queries(client):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, 'before_cursor_execute', record)
+    yield statements
+    event.remove(db.engine, 'before_cursor_execute', record)
+
+
 @pytest.fixture
 def auth(monkeypatch):
     class AuthFixture: